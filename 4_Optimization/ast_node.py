@@ -14,8 +14,9 @@ class ASTNode:
         return "ASTNode()"
 
 class IdentifierNode(ASTNode):
-    def __init__(self, name):
+    def __init__(self, name, symbol=None):
         self.name = name
+        self.symbol = symbol    # id in the compilation's SymbolTable, None if built without a token
 
     def _repr(self, indent):
         indent_str = "    " * indent
@@ -163,6 +164,18 @@ class FuncDefNode(ASTNode):
         self.params = params
         self.body = body
 
+    # Parser(lazy=True) leaves a parser.DeferredBody here instead of the statements; it is parsed the
+    # first time body is read
+    @property
+    def body(self):
+        if not isinstance(self._body, list):
+            self._body = self._body.parse()
+        return self._body
+
+    @body.setter
+    def body(self, body):
+        self._body = body
+
     def _repr(self, indent):
         indent_str = "    " * indent
         body_repr = "\n".join(stmt._repr(indent + 2) for stmt in self.body)
@@ -219,8 +232,9 @@ class FuncCallNode(ASTNode):
 
 # Dictionary and items
 class DictNode(ASTNode):
-    def __init__(self, name, key=None, value=None):
+    def __init__(self, name, key=None, value=None, symbol=None):
         self.name = name
+        self.symbol = symbol    # as in IdentifierNode
         self.key = key
         self.value = value
 
@@ -261,8 +275,9 @@ class DictAssignNode:
     
 # List and Elements
 class ListNode(ASTNode):
-    def __init__(self, name, elements=None):
+    def __init__(self, name, elements=None, symbol=None):
         self.name = name
+        self.symbol = symbol    # as in IdentifierNode
         self.elements = elements
 
     def _repr(self, indent):
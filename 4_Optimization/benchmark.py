@@ -0,0 +1,797 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import platform
+import tempfile
+import statistics
+import subprocess
+import threading
+import tracemalloc
+import concurrent.futures
+
+import ast_node
+import lexer_2
+import parser
+import token_cache
+
+# A small Hana program repeated to build large inputs
+SNIPPET = '''함수 더하기(x, y) {
+    결과 = x + y
+    반환 결과
+}
+
+# 반복문 테스트
+카운터 = 0
+동안에 (카운터 < 10) {
+    출력(더하기(카운터, 2.5))
+    카운터 = 카운터 + 1
+}
+문자열 = "안녕하세요 하나 언어"
+'''
+
+
+# Identifiers mixed with reserved words, for keyword classification
+WORDS = ["카운터", "결과값", "함수", "반환", "배열", "이름", "그리고", "최대값", "합계_1", "변수_가"]
+
+
+def build_source(copies):
+    return SNIPPET * copies
+
+
+# Synthetic programs for the benchmark suite, built from the constructs the samples use
+SYLLABLES = "가나다라마바사아자차카타파하고노도로모보소오조초코토포호구누두루무부수우주추쿠투푸후"
+LINE_SIZES = (1000, 10000, 100000, 1000000)
+
+
+def generate_names(rng, count):
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        if rng.random() < 0.3:
+            name += "_{}".format(rng.randint(0, 99))
+        if name not in lexer_2.WORD_TYPES:
+            names.add(name)
+    return sorted(names)
+
+
+def generate_expr(rng, names, depth=0):
+    if depth > 1 or rng.random() < 0.4:
+        return rng.choice([rng.choice(names), str(rng.randint(0, 1000)), "{}.{}".format(rng.randint(0, 99), rng.randint(0, 99))])
+    operator = rng.choice(["+", "-", "*", "/", "%"])
+    expr = "{} {} {}".format(generate_expr(rng, names, depth + 1), operator, generate_expr(rng, names, depth + 1))
+    return "({})".format(expr) if rng.random() < 0.3 else expr
+
+
+def generate_text(rng, length):
+    words = []
+    while sum(len(word) + 1 for word in words) < length:
+        words.append("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 5))))
+    return " ".join(words)
+
+
+def generate_function(rng, names):
+    name, first, second, result = rng.sample(names, 4)
+    lines = ["함수 {}({}, {}) {{".format(name, first, second),
+             "    {} = {}".format(result, generate_expr(rng, [first, second])),
+             "    만약에 ({} <= {}) {{".format(result, rng.randint(0, 100)),
+             "        반환 {}".format(first),
+             "    } 아니면 {",
+             "        반환 {} + {}".format(result, second),
+             "    }",
+             "}",
+             "{}({}, {})".format(name, rng.randint(0, 9), rng.randint(0, 9))]
+    return lines
+
+
+def generate_loop(rng, names):
+    counter, items = rng.sample(names, 2)
+    return ["배열 {} = []".format(items),
+            "{} = 0".format(counter),
+            "동안에 ({} < {}) {{".format(counter, rng.randint(5, 500)),
+            "    {}.추가({})".format(items, generate_expr(rng, names)),
+            "    {} = {} + 1".format(counter, counter),
+            "}",
+            "{} = {}.뽑기()".format(rng.choice(names), items)]
+
+
+def generate_dictionary(rng, names):
+    table, key = rng.sample(names, 2)
+    return ["딕셔너리 {} = {{}}".format(table),
+            "{} = 0".format(key),
+            "동안에 ({} < {}) {{".format(key, rng.randint(5, 500)),
+            "    {}[{}] = {}".format(table, key, generate_expr(rng, names)),
+            "    {} = {} + 1".format(key, key),
+            "}",
+            "{} = {}.키()".format(rng.choice(names), table)]
+
+
+def generate_string(rng, names):
+    name = rng.choice(names)
+    return ["{} = \"{}\"".format(name, generate_text(rng, rng.randint(40, 400))),
+            "출력({})".format(name)]
+
+
+def generate_comment(rng, names):
+    return ["# " + generate_text(rng, rng.randint(10, 120)) for _ in range(rng.randint(1, 3))]
+
+
+def generate_statement(rng, names):
+    return ["{} = {}".format(rng.choice(names), generate_expr(rng, names))]
+
+
+GENERATORS = (generate_function, generate_loop, generate_dictionary, generate_string, generate_comment,
+              generate_statement, generate_statement)
+
+
+def generate_program(lines, seed=4115):
+    # A Hana program of exactly `lines` lines; the same arguments always give the same program
+    rng = random.Random(seed)
+    names = generate_names(rng, 500)
+    program = []
+    while len(program) < lines:
+        block = rng.choice(GENERATORS)(rng, names)
+        if len(program) + len(block) > lines:
+            block = generate_statement(rng, names)
+        program.extend(block)
+    return "\n".join(program) + "\n"
+
+
+def token_key(tokens):
+    return [(token.type, token.value) for token in tokens]
+
+
+def time_engine(engine, source, repeat=3):
+    best = None
+    tokens = None
+    for _ in range(repeat):
+        lexer = lexer_2.Lexer(engine=engine)
+        start = time.perf_counter()
+        tokens = lexer.tokenize(source)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, tokens
+
+
+def bench_engines(source):
+    print("Lexing {} characters".format(len(source)))
+    reference = None
+    for engine in lexer_2.ENGINES:
+        elapsed, tokens = time_engine(engine, source)
+        if reference is None:
+            reference = token_key(tokens)
+        elif token_key(tokens) != reference:
+            print("Warning: engine '{}' produced a different token stream".format(engine))
+        print("{:>8}: {:>10.0f} chars/sec ({:.3f}s, {} tokens)".format(engine, len(source) / elapsed, elapsed, len(tokens)))
+
+
+def build_whitespace_source(size):
+    # deeply indented statements separated by runs of blank lines
+    block = " " * 2000 + "x = 1\n" + "\n" * 3000 + "\t" * 500 + "출력(x)\n"
+    return block * (size // len(block) + 1)
+
+
+# Largest time ratio bench_whitespace accepts for 4x the input: 4 when linear, 16 when quadratic
+WHITESPACE_MAX_RATIO = 6.0
+
+
+def bench_whitespace(megabytes):
+    # Lexing must not recurse per whitespace character, so run under a small recursion limit,
+    # and 4x the input should take about 4x the time; fails if any engine grows faster than that.
+    for engine in lexer_2.ENGINES:
+        lexer_2.Lexer(engine=engine)    # the numpy engine imports NumPy, which needs a deeper stack
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(100)
+    try:
+        superlinear = []
+        for engine in lexer_2.ENGINES:
+            times = []
+            for size in (megabytes * 1024 * 1024 // 4, megabytes * 1024 * 1024):
+                source = build_whitespace_source(size)
+                elapsed, tokens = time_engine(engine, source)
+                times.append(elapsed)
+            ratio = times[1] / times[0]
+            print("{:>8}: {:.3f}s for {} MB, {:.2f}x the time of a quarter of the input".format(engine, times[1], megabytes, ratio))
+            if ratio > WHITESPACE_MAX_RATIO:
+                superlinear.append("{} ({:.2f}x)".format(engine, ratio))
+    finally:
+        sys.setrecursionlimit(limit)
+    assert not superlinear, "lexing time grows faster than the input: " + ", ".join(superlinear)
+
+
+def bench_spans(megabytes):
+    # strings and comments are SpanTokens: lexing should not copy them, reading .value slices once
+    size = megabytes * 1024 * 1024
+    sources = [
+        ("string literal", 'x = "' + "가나다라 " * (size // 5) + '"\n출력(x)\n'),
+        ("comment block", ("# " + "주석입니다 " * 10 + "\n") * (size // 63)),
+    ]
+    for name, source in sources:
+        print("{} ({} characters)".format(name, len(source)))
+        for engine in lexer_2.ENGINES:
+            elapsed, tokens = time_engine(engine, source)
+            start = time.perf_counter()
+            for token in tokens:
+                token.value
+            materialize = time.perf_counter() - start
+            print("{:>8}: lex {:.4f}s, materialize values {:.4f}s".format(engine, elapsed, materialize))
+
+
+def bench_identifiers(lines):
+    source = "\n".join(" ".join(WORDS) for _ in range(lines))
+    for engine in lexer_2.ENGINES:
+        elapsed, tokens = time_engine(engine, source)
+        print("{:>8}: {:>10.0f} identifiers/sec ({:.3f}s, {} tokens)".format(engine, len(tokens) / elapsed, elapsed, len(tokens)))
+
+
+def bench_char_classes(copies):
+    # one CHAR_TABLE lookup per character against the str methods the lexer used before
+    source = build_source(copies)
+    table = lexer_2.CHAR_TABLE
+    start = time.perf_counter()
+    for char in source:
+        code = ord(char)
+        table[code] if code < 0x10000 else lexer_2.OTHER_CLASS
+    table_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for char in source:
+        char.isspace() or char.isdigit() or char.isalpha()
+    method_time = time.perf_counter() - start
+    print("CHAR_TABLE:  {:>10.0f} chars/sec".format(len(source) / table_time))
+    print("str methods: {:>10.0f} chars/sec".format(len(source) / method_time))
+    bench_engines(source)
+
+
+def bench_memory(copies):
+    # memory held by the token list (tokens and their values) after lexing, per token
+    source = build_source(copies)
+    for engine in lexer_2.ENGINES:
+        lexer = lexer_2.Lexer(engine=engine)    # outside the trace: the numpy engine imports NumPy
+        tracemalloc.start()
+        tokens = lexer.tokenize(source)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("{:>8}: {:.1f} bytes/token, peak {:.1f} bytes/token ({} tokens)".format(engine, current / len(tokens), peak / len(tokens), len(tokens)))
+        del tokens
+
+
+def bench_parallel(copies):
+    # tokenize_parallel with 1/2/4/8 workers against tokenize; pools are started before timing
+    source = build_source(copies)
+    print("Lexing {} characters".format(len(source)))
+    serial, reference = time_engine("regex", source, repeat=1)
+    print("  serial: {:.3f}s".format(serial))
+    # the part that stays in the calling process, whatever the number of workers
+    results = [lexer_2.lex_chunk(source, 0, "regex")]
+    start = time.perf_counter()
+    list(lexer_2.Lexer(engine="regex").stitch_tokens(source, results))
+    adopt = time.perf_counter() - start
+    print("  adopting worker results: {:.3f}s, {:.0%} of serial".format(adopt, adopt / serial))
+    for workers in (1, 2, 4, 8):
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(abs, range(workers)))
+            start = time.perf_counter()
+            tokens = lexer_2.Lexer(engine="regex").tokenize_parallel(source, workers=workers, executor=pool)
+            elapsed = time.perf_counter() - start
+        if token_key(tokens) != token_key(reference):
+            print("Warning: {} workers produced a different token stream".format(workers))
+        print("{:>8}: {:.3f}s, {:.2f}x serial".format("{} proc".format(workers), elapsed, serial / elapsed))
+
+
+def bench_relex(lines, edits=200):
+    # single-character insertions, deletions and replacements at random offsets of a lines-long source
+    source = build_source(lines // SNIPPET.count("\n") + 1)
+    lexer = lexer_2.Lexer(engine="regex")
+    start = time.perf_counter()
+    tokens = lexer.tokenize(source)
+    full = time.perf_counter() - start
+    print("{} lines, {} tokens, full tokenize {:.4f}s".format(source.count("\n"), len(tokens), full))
+    random.seed(4115)
+    for name, removed, text in (("insert", 0, "가"), ("delete", 1, ""), ("replace", 1, "1")):
+        times = []
+        for _ in range(edits):
+            offset = random.randrange(len(lexer.input) - removed)
+            start = time.perf_counter()
+            tokens = lexer.relex(tokens, offset, offset + removed, text)
+            times.append(time.perf_counter() - start)
+        print("{:>8}: median {:.2f}ms, max {:.2f}ms".format(name, statistics.median(times) * 1000, max(times) * 1000))
+    if token_key(tokens) != token_key(lexer_2.Lexer(engine="regex").tokenize(lexer.input)):
+        print("Warning: relexed tokens differ from a full tokenize")
+
+
+def bench_mmap(megabytes):
+    # lexing a file from an mmap against reading and decoding it first. Time is for the whole file;
+    # the peak memory is traced up to the first token, which is when the decoded copy exists.
+    source = build_source(megabytes * 1024 * 1024 // len(SNIPPET.encode("utf-8")) + 1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "source.hana")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(source)
+        del source
+
+        def decoded():
+            with open(path, "r", encoding="utf-8") as f:
+                return lexer_2.Lexer(engine="regex").iter_tokens(f.read())
+
+        for name, tokens in (("decoded", decoded), ("mmap", lambda: lexer_2.Lexer().iter_mmap_tokens(path))):
+            start = time.perf_counter()
+            count = sum(1 for _ in tokens())
+            elapsed = time.perf_counter() - start
+            tracemalloc.start()
+            next(tokens())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("{:>8}: {:.3f}s ({} tokens), peak {:.1f} MB before the first token".format(name, elapsed, count, peak / 1024 / 1024))
+
+
+def bench_cache(copies):
+    # Parser start-up (lexing) with the token cache cold and warm, against no cache
+    source = build_source(copies)
+    with tempfile.TemporaryDirectory() as directory:
+        cache = token_cache.enable(directory)
+        try:
+            for name in ("cold", "warm"):
+                start = time.perf_counter()
+                parser.Parser(source, engine="regex")
+                print("{:>8}: {:.3f}s".format(name, time.perf_counter() - start))
+        finally:
+            token_cache.disable()
+        start = time.perf_counter()
+        parser.Parser(source, engine="regex")
+        print("{:>8}: {:.3f}s ({} hits, {} misses)".format("no cache", time.perf_counter() - start, cache.hits, cache.misses))
+
+
+async def lex_slow_stream(source, delay):
+    # lex source as it arrives in 4 KB pieces, one every delay seconds
+    reader = asyncio.StreamReader()
+    data = source.encode("utf-8")
+
+    async def feed():
+        for start in range(0, len(data), 4096):
+            reader.feed_data(data[start:start + 4096])
+            await asyncio.sleep(delay)
+        reader.feed_eof()
+
+    feeder = asyncio.create_task(feed())
+    tokens = await lexer_2.Lexer().tokenize_stream(reader)
+    await feeder
+    return tokens
+
+
+def bench_async(streams, delay=0.01):
+    # the same streams lexed one after another and concurrently in one event loop
+    source = build_source(200)
+
+    async def sequential():
+        return [await lex_slow_stream(source, delay) for _ in range(streams)]
+
+    async def concurrent():
+        return await asyncio.gather(*(lex_slow_stream(source, delay) for _ in range(streams)))
+
+    reference = token_key(lexer_2.Lexer().tokenize(source))
+    for name, run in (("sequential", sequential), ("concurrent", concurrent)):
+        start = time.perf_counter()
+        results = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        if any(token_key(tokens) != reference for tokens in results):
+            print("Warning: a stream produced a different token stream")
+        print("{:>10}: {:.3f}s for {} streams of {} characters".format(name, elapsed, streams, len(source)))
+
+
+EXPRESSION_OPERATORS = ["+", "-", "*", "**", "/", "%", "<", "<=", ">", ">=", "==", "!=", "그리고", "이거나"]
+
+
+def generate_expressions(lines, seed=4115):
+    # assignments of long expressions mixing every binary operator, with parentheses
+    rng = random.Random(seed)
+    names = generate_names(rng, 200)
+
+    def expr(depth):
+        if depth > 3 or rng.random() < 0.25:
+            return rng.choice([rng.choice(names), str(rng.randint(0, 1000))])
+        text = "{} {} {}".format(expr(depth + 1), rng.choice(EXPRESSION_OPERATORS), expr(depth + 1))
+        return "({})".format(text) if rng.random() < 0.2 else text
+
+    return "".join("{} = {}\n".format(rng.choice(names), expr(0)) for _ in range(lines))
+
+
+class ChainParser(parser.Parser):
+    # The expression parser Parser used before BINDING_POWERS: one method per precedence level
+    def parse_expr(self):
+        left = self.parse_pred()
+        while self.current_token() and self.current_token().value in ["&&", "||", '!=', '==', '<=', '>=', '>', '<', "그리고", "이거나", ","]:
+            operator = self.current_token().value
+            self.advance()
+            right = self.parse_pred()
+            left = ast_node.BinaryOpNode(left, operator, right)
+        return left
+
+    def parse_pred(self):
+        left = self.parse_term()
+        while self.current_token() and self.current_token().value in ["+", "-"]:
+            operator = self.current_token().value
+            self.advance()
+            right = self.parse_term()
+            left = ast_node.BinaryOpNode(left, operator, right)
+        return left
+
+    def parse_term(self):
+        left = self.parse_base_expr()
+        while self.current_token() and self.current_token().value in ["*", "**", "/", "%"]:
+            operator = self.current_token().value
+            self.advance()
+            right = self.parse_base_expr()
+            left = ast_node.BinaryOpNode(left, operator, right)
+        return left
+
+
+def count_calls(function):
+    # number of Python function calls made while running function()
+    calls = 0
+
+    def profile(frame, event, arg):
+        nonlocal calls
+        if event == "call":
+            calls += 1
+
+    sys.setprofile(profile)
+    try:
+        function()
+    finally:
+        sys.setprofile(None)
+    return calls
+
+
+def bench_expressions(lines):
+    # Parser.parse with precedence climbing against the chain it replaced; the tokens are lexed once
+    source = generate_expressions(lines)
+    print("Parsing {} lines of expressions ({} characters)".format(lines, len(source)))
+    trees = {}
+    for parser_class in (ChainParser, parser.Parser):
+        best = None
+        for _ in range(3):
+            instance = parser_class(source)
+            start = time.perf_counter()
+            trees[parser_class] = instance.parse()
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        calls = count_calls(parser_class(source).parse)
+        print("{:>12}: {:.3f}s, {} Python calls".format(parser_class.__name__, best, calls))
+    assert repr(trees[ChainParser]) == repr(trees[parser.Parser]), "expression trees differ"
+
+
+def generate_nested(depth, kind):
+    # one construct nested depth times: alternating 만약에/동안에 blocks, parentheses or function calls
+    if kind == "blocks":
+        heads = ("만약에 (x < {}) {{\n" if level % 2 else "동안에 (x < {}) {{\n" for level in range(depth))
+        return "x = 0\n" + "".join(head.format(level) for level, head in enumerate(heads)) + "x = x + 1\n" + "}\n" * depth
+    if kind == "parens":
+        return "x = " + "(" * depth + "1" + " + 1)" * depth + "\n"
+    return "x = " + "f(" * depth + "1" + ")" * depth + "\n"
+
+
+def tree_depth(nodes):
+    # nesting depth of an AST, walked with a list so that deep trees can be measured
+    deepest = 0
+    stack = [(node, 1) for node in nodes]
+    while stack:
+        node, depth = stack.pop()
+        deepest = max(deepest, depth)
+        for value in vars(node).values():
+            for child in value if isinstance(value, list) else [value]:
+                if isinstance(child, ast_node.ASTNode):
+                    stack.append((child, depth + 1))
+    return deepest
+
+
+def same_tree(first, second):
+    # whether two ASTs have the same node types and values, walked with a list like tree_depth
+    stack = [(first, second)]
+    while stack:
+        first, second = stack.pop()
+        if isinstance(first, list) and isinstance(second, list):
+            if len(first) != len(second):
+                return False
+            stack.extend(zip(first, second))
+        elif isinstance(first, ast_node.ASTNode) and isinstance(second, ast_node.ASTNode):
+            fields, other = vars(first), vars(second)
+            if type(first) is not type(second) or fields.keys() != other.keys():
+                return False
+            stack.extend((fields[name], other[name]) for name in fields)
+        elif first != second:
+            return False
+    return True
+
+
+def parse_deep(source):
+    # The recursive parser's AST for source, parsed in a thread with a stack and recursion limit
+    # large enough for any nesting depth the benchmark uses
+    result = []
+    limit = sys.getrecursionlimit()
+    stack_size = threading.stack_size(1 << 29)
+    sys.setrecursionlimit(10 ** 7)
+    try:
+        thread = threading.Thread(target=lambda: result.append(parser.Parser(source).parse()))
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(stack_size)
+        sys.setrecursionlimit(limit)
+    return result[0]
+
+
+# Malformed programs for check_options: a function body that does not parse, one left open, one
+# opened with [ or (, a statement that is not one, and an unclosed expression
+RECOVERY_SOURCES = [
+    "함수 f(a) {\n a = 1\n 5\n b = 2\n}\n함수 g(b) {\n 반환 b\n}\nx = 2\n",
+    "함수 f(a) {\n 만약에 a < 1 {\n 반환 a\n }\n",
+    "함수 f(a) [\n a = 1\n 출력(a)\n]\nx = 2\n",
+    "함수 f(a, b) (\n 반환 a + b\n)\n함수 g() {\n}\n",
+    "동안에 x < 1 {\n 5\n}\n",
+    "x = (1 + f(2, [\n",
+]
+
+
+def parse_outcome(parser_class, source, **options):
+    # repr of the AST that parser_class(source, **options).parse() gives, or of the error it raises
+    try:
+        return repr(parser_class(source, **options).parse())
+    except Exception as error:
+        return "{}: {}".format(type(error).__name__, error)
+
+
+def check_options(**options):
+    # Parser options must not change the AST: fail when Parser(**options) disagrees with the plain
+    # recursive parser on the samples, generated programs or any of the recovery paths. This guards
+    # what is written twice, the *_steps generators (iterative=True) and BodyCheck (lazy=True).
+    # ChainParser overrides parse_expr without parse_expr_steps, which the iterative mode must keep.
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
+    sources = []
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), encoding="utf-8") as f:
+            sources.append(f.read())
+    sources += [generate_program(2000), generate_expressions(500), generate_library(200)] + RECOVERY_SOURCES
+    for number, source in enumerate(sources):
+        for parser_class in (parser.Parser, ChainParser):
+            expected = parse_outcome(parser_class, source)
+            assert parse_outcome(parser_class, source, **options) == expected, \
+                "{}({}) differs on input {}".format(parser_class.__name__, options, number)
+    print("Parser({}) agrees with the recursive parser on {} inputs".format(options, len(sources)))
+
+
+def bench_nesting(depth):
+    # Parser(iterative=True) on inputs nested depth levels deep, which the recursive parser cannot
+    # parse with the default recursion limit. The AST must be as deep as the input is nested and
+    # equal to the recursive parser's, which is given the stack it needs in parse_deep.
+    check_options(iterative=True)
+    for kind in ("blocks", "parens", "calls"):
+        source = generate_nested(depth, kind)
+        try:
+            parser.Parser(source).parse()
+            recursive = "ok"
+        except RecursionError:
+            recursive = "RecursionError"
+        instance = parser.Parser(source, iterative=True)
+        start = time.perf_counter()
+        ast = instance.parse()
+        elapsed = time.perf_counter() - start
+        print("{:>6} x {}: recursive {}, iterative {:.3f}s, AST depth {}".format(kind, depth, recursive, elapsed, tree_depth(ast)))
+        # the statements around the nesting add 3 levels to a block, 2 to an expression
+        expected = depth + (3 if kind == "blocks" else 2)
+        assert tree_depth(ast) == expected, "{} x {}: AST depth {}, expected {}".format(kind, depth, tree_depth(ast), expected)
+        assert same_tree(ast, parse_deep(source)), "{} x {}: iterative parse differs".format(kind, depth)
+
+
+def bench_stream(lines):
+    # Parser over the whole token list against Parser(stream=True), which lexes as it parses and
+    # keeps STREAM_WINDOW tokens; peak memory includes the AST, which both build
+    source = generate_program(lines)
+    print("Parsing {} lines ({} characters)".format(lines, len(source)))
+    trees = {}
+    for stream in (False, True):
+        start = time.perf_counter()
+        trees[stream] = parser.Parser(source, stream=stream).parse()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        parser.Parser(source, stream=stream).parse()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print("{:>6}: {:.3f}s, peak {:.1f} MB".format("stream" if stream else "list", elapsed, peak / 1e6))
+    assert repr(trees[False]) == repr(trees[True]), "stream parse differs"
+
+
+# One statement of each kind; block statements are timed inside a single 동안에 block
+TOP_LEVEL_STATEMENTS = {
+    "함수": "함수 더하기(a, b) {\n반환 a + b\n}\n",
+    "출력": "출력(x)\n",
+    "만약에": "만약에 (x < 1) {\n} 아니면 {\n}\n",
+    "동안에": "동안에 (x < 1) {\n}\n",
+    "배열": "배열 목록 = []\n",
+    "딕셔너리": "딕셔너리 사전 = {}\n",
+    "call": "더하기(1, 2)\n",
+    "assign": "x = 1\n",
+}
+BLOCK_STATEMENTS = {
+    "반환": "반환 x\n",
+    "출력": "출력(x)\n",
+    "만약에": "만약에 (x < 1) {\n}\n",
+    "method": "목록.추가(1)\n",
+    "element": "사전[x] = 1\n",
+    "assign": "x = 1\n",
+}
+
+
+def bench_statements(count):
+    # statements parsed per second for each kind of statement, tokens lexed beforehand
+    for place, statements in (("top", TOP_LEVEL_STATEMENTS), ("block", BLOCK_STATEMENTS)):
+        for kind, statement in statements.items():
+            source = statement * count
+            if place == "block":
+                source = "동안에 (x < 1) {\n" + source + "}\n"
+            best = None
+            for _ in range(3):
+                instance = parser.Parser(source)
+                start = time.perf_counter()
+                instance.parse()
+                elapsed = time.perf_counter() - start
+                if best is None or elapsed < best:
+                    best = elapsed
+            print("{:>5} {:>8}: {:>9.0f} statements/s".format(place, kind, count / best))
+
+
+def generate_library(functions, seed=4115):
+    # many function definitions with loops and conditionals in their bodies, and a call to only one
+    rng = random.Random(seed)
+    names = generate_names(rng, 500)
+    program = []
+    for index in range(functions):
+        first, second, counter = rng.sample(names, 3)
+        program += ["함수 함수_{}({}, {}) {{".format(index, first, second),
+                    "    {} = 0".format(counter),
+                    "    동안에 ({} < {}) {{".format(counter, second),
+                    "        {} = {}".format(first, generate_expr(rng, [first, second, counter])),
+                    "        만약에 ({} > {}) {{".format(first, rng.randint(0, 100)),
+                    "            출력({})".format(first),
+                    "        }",
+                    "        {} = {} + 1".format(counter, counter),
+                    "    }",
+                    "    반환 {}".format(generate_expr(rng, [first, second])),
+                    "}"]
+    program.append("함수_0(1, 2)")
+    return "\n".join(program) + "\n"
+
+
+def bench_lazy(functions):
+    # front-end time (lexing and parsing) with every function body parsed against Parser(lazy=True),
+    # which checks each body with BodyCheck instead, and the time to parse the deferred bodies afterwards
+    check_options(lazy=True)
+    source = generate_library(functions)
+    print("Parsing {} functions ({} characters)".format(functions, len(source)))
+    for lazy in (False, True):
+        start = time.perf_counter()
+        instance = parser.Parser(source, lazy=lazy)
+        lexed = time.perf_counter()
+        ast = instance.parse()
+        parsed = time.perf_counter()
+        print("{:>6}: lex {:.3f}s, parse {:.3f}s".format("lazy" if lazy else "eager", lexed - start, parsed - lexed))
+        if not lazy:
+            expected = repr(ast)
+            del instance, ast
+    start = time.perf_counter()
+    instance.parse_deferred_bodies()
+    print("bodies: {:.3f}s, {} of {} deferred".format(time.perf_counter() - start, len(instance.deferred), functions))
+    assert repr(ast) == expected, "lazy parse differs"
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def bench_suite(max_lines, output=None):
+    # Lexer.tokenize on generated programs of 1K lines up to max_lines with every engine, as JSON
+    # that can be compared across commits with the compare mode
+    report = {"commit": git_commit(), "python": platform.python_version(), "time": time.time(), "results": []}
+    for lines in LINE_SIZES:
+        if lines > max_lines:
+            break
+        source = generate_program(lines)
+        for engine in lexer_2.ENGINES:
+            elapsed, tokens = time_engine(engine, source, repeat=3 if lines <= 100000 else 1)
+            report["results"].append({
+                "engine": engine,
+                "lines": lines,
+                "characters": len(source),
+                "tokens": len(tokens),
+                "seconds": elapsed,
+                "chars_per_sec": len(source) / elapsed,
+                "tokens_per_sec": len(tokens) / elapsed,
+            })
+            print("{:>8} lines {:>6}: {:.3f}s".format(lines, engine, elapsed), file=sys.stderr)
+            del tokens
+    if output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def compare_suites(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print("{} -> {}".format(before["commit"], after["commit"]))
+    times = {(result["engine"], result["lines"]): result["seconds"] for result in before["results"]}
+    for result in after["results"]:
+        key = (result["engine"], result["lines"])
+        if key in times:
+            print("{:>8} lines {:>6}: {:.3f}s -> {:.3f}s ({:.2f}x)".format(result["lines"], result["engine"], times[key], result["seconds"], times[key] / result["seconds"]))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "whitespace":
+        bench_whitespace(int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "identifiers":
+        bench_identifiers(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "charclass":
+        bench_char_classes(int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "memory":
+        bench_memory(int(sys.argv[2]) if len(sys.argv) > 2 else 2000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "spans":
+        bench_spans(int(sys.argv[2]) if len(sys.argv) > 2 else 1)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "parallel":
+        bench_parallel(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "relex":
+        bench_relex(int(sys.argv[2]) if len(sys.argv) > 2 else 50000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "mmap":
+        bench_mmap(int(sys.argv[2]) if len(sys.argv) > 2 else 20)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        bench_cache(int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "async":
+        bench_async(int(sys.argv[2]) if len(sys.argv) > 2 else 8)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "expressions":
+        bench_expressions(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "nesting":
+        bench_nesting(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "stream":
+        bench_stream(int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "statements":
+        bench_statements(int(sys.argv[2]) if len(sys.argv) > 2 else 20000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "lazy":
+        bench_lazy(int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "suite":
+        bench_suite(int(sys.argv[2]) if len(sys.argv) > 2 else 1000000, sys.argv[3] if len(sys.argv) > 3 else None)
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        compare_suites(sys.argv[2], sys.argv[3])
+        return
+    copies = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    bench_engines(build_source(copies))
+
+
+if __name__ == "__main__":
+    main()
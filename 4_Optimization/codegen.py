@@ -7,33 +7,38 @@ import ast_node
 from parser import Parser
 
 class MIPSCodeGenerator:
-    def __init__(self):
+    def __init__(self, symbols=None):
         self.code = []
         self.label_counter = 0
         self.stack_offset = 4  # Keeps track of the current stack offset
-        self.variable_stack = {}  # Maps variable names to stack offsets
-        self.list_map = {}
-        self.dictionary_map = {}
+        self.variable_stack = {}  # Maps variable symbol ids (in self.symbols) to stack offsets
+        self.symbols = lexer_2.SymbolTable() if symbols is None else symbols    # the Parser's table
+        self.list_map = {}  # Maps list symbol ids to their .data labels
+        self.dictionary_map = {}  # Maps dictionary symbol ids to their .data labels
         self.register_state = {}  # Track register values to avoid redundant loads
         self.data_section = []  # To store .data section declarations
 
+    def variable_symbol(self, node):
+        # symbol id of an IdentifierNode, ListNode or DictNode, interning its name for nodes built without a token
+        return node.symbol if node.symbol is not None else self.symbols.intern(node.name)
+
     def generate_label(self, base="label"):
         label = f"{base}_{self.label_counter}"
         self.label_counter += 1
         return label
     
-    def allocate_stack(self, var_name):
+    def allocate_stack(self, symbol):
         """Allocate stack space for a variable and update the stack offset."""
-        if var_name not in self.variable_stack:
+        if symbol not in self.variable_stack:
             self.stack_offset -= 4  # Decrement stack pointer for new variable (4 bytes per word)
-            self.variable_stack[var_name] = self.stack_offset
-            print(f"Allocated stack for variable {var_name} at offset {self.stack_offset}")  # Debug log
+            self.variable_stack[symbol] = self.stack_offset
+            print(f"Allocated stack for variable {self.symbols.name(symbol)} at offset {self.stack_offset}")  # Debug log
 
-    def get_stack_offset(self, var_name):
-        if var_name in self.variable_stack:
-            return self.variable_stack[var_name]
+    def get_stack_offset(self, symbol):
+        if symbol in self.variable_stack:
+            return self.variable_stack[symbol]
         else:
-            raise ValueError(f"Variable {var_name} not found in stack.")
+            raise ValueError(f"Variable {self.symbols.name(symbol)} not found in stack.")
 
     def load_constant(self, register, value):
         """Load a constant into a register, avoiding redundant loads."""
@@ -64,8 +69,9 @@ class MIPSCodeGenerator:
  
     def handle_assign_node(self, node):
         self.process_ast(node.expr)  # Generate code for the right-hand sid
-        self.allocate_stack(node.var.name)  # Allocate space for variable if not already done
-        stack_offset = self.get_stack_offset(node.var.name)
+        symbol = self.variable_symbol(node.var)
+        self.allocate_stack(symbol)  # Allocate space for variable if not already done
+        stack_offset = self.get_stack_offset(symbol)
         self.code.append(f"sw $v0, {stack_offset}($sp)")
 
     def handle_binaryop_node(self, node):
@@ -94,10 +100,11 @@ class MIPSCodeGenerator:
             self.code.append("sge $v0, $t1, $v0")
     
     def handle_identifier_node(self, node):
-        if node.name not in self.variable_stack:
+        symbol = self.variable_symbol(node)
+        if symbol not in self.variable_stack:
             print(f"Warning: Variable '{node.name}' not found in stack. Allocating now.")
-            self.allocate_stack(node.name)
-        stack_offset = self.get_stack_offset(node.name)
+            self.allocate_stack(symbol)
+        stack_offset = self.get_stack_offset(symbol)
         self.code.append(f"lw $v0, {stack_offset}($sp)")
         
     def handle_print_node(self, node):
@@ -148,13 +155,14 @@ class MIPSCodeGenerator:
         self.code.append(f"{end_label}:")
     
     def handle_dict_node(self, node):
-        if node.name not in self.dictionary_map:
-            label = f"딕셔너리_{node.name}"
-            self.dictionary_map[node.name] = label
+        symbol = self.variable_symbol(node)
+        if symbol not in self.dictionary_map:
+            label = f"딕셔너리_{self.symbols.name(symbol)}"
+            self.dictionary_map[symbol] = label
             self.data_section.append(f"{label}: .space 400")
     
     def handle_dict_assign_node(self, node):
-        dict_label = self.dictionary_map[node.dict.name]
+        dict_label = self.dictionary_map[self.variable_symbol(node.dict)]
         self.process_ast(node.key)
         self.code.append(f"sll $t0, $v0, 2")
         self.code.append(f"la $t1, {dict_label}")
@@ -165,14 +173,15 @@ class MIPSCodeGenerator:
         self.code.append(f"sw $v0, 0($t2)")
 
     def handle_list_node(self, node):
-        if node.name not in self.list_map:
-            label = f"리스트_{node.name}"
-            self.list_map[node.name] = label
+        symbol = self.variable_symbol(node)
+        if symbol not in self.list_map:
+            label = f"리스트_{self.symbols.name(symbol)}"
+            self.list_map[symbol] = label
             self.data_section.append(f"{label}: .space 400")
 
     def handle_method_node(self, node):
         if node.method == "추가":
-            list_label = next(iter(self.list_map))
+            list_label = self.symbols.name(next(iter(self.list_map)))
             self.code.append(f"la $t0, {list_label}")
             self.code.append("addi $t1, $zero, 0")
             self.code.append("loop:")
@@ -185,7 +194,7 @@ class MIPSCodeGenerator:
             self.code.append("sw $v0, 0($t0)")
 
         elif node.method == "뽑기":
-            list_label = next(iter(self.list_map))
+            list_label = self.symbols.name(next(iter(self.list_map)))
             # Load base address of the list
             self.code.append(f"la $t0, {list_label}")
             self.code.append("addi $t1, $zero, 0")
@@ -248,16 +257,18 @@ class MIPSCodeGenerator:
         return f".data\n{data_section}\n\n.text\n.globl main\n{text_section}"
 
 class Pipeline:
-    def __init__(self, source_code, output_filename):
+    def __init__(self, source_code, output_filename, lex_stats=False):
         self.generator = MIPSCodeGenerator()
         self.source_code = source_code
         self.output_filename = output_filename
+        self.lex_stats = lex_stats
 
     def process(self):
         # Step 1: Lexical Analysis
         # Step 2: Syntactic Analysis
-        parser = Parser(self.source_code)
+        parser = Parser(self.source_code, lex_stats=self.lex_stats)
         ast = parser.parse()
+        self.generator.symbols = parser.symbols     # the ids in the AST are the parser's
 
         # Step 3: Code Generation
         for node in ast:
@@ -272,14 +283,17 @@ class Pipeline:
         with open(self.output_filename, "w") as output_file:
             output_file.write(generated_code)
         print(f"Generated MIPS code saved to {self.output_filename}")
+        if self.lex_stats:
+            lexer_2.print_stats(parser.lexer.stats)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python mips_codegen.py <input_file>")
+    args, lex_stats = lexer_2.lex_stats_flag(sys.argv[1:])
+    if len(args) != 1:
+        print("Usage: python mips_codegen.py [--lex-stats] <input_file>")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
     with open(input_file, "r", encoding="utf-8") as f:
         source_code = f.read()
 
@@ -291,5 +305,5 @@ if __name__ == "__main__":
     else:
         output_filename = "samples_output/output.asm"  # Default output name if no sample number is found
 
-    pipeline = Pipeline(source_code, output_filename)
+    pipeline = Pipeline(source_code, output_filename, lex_stats)
     pipeline.process()
\ No newline at end of file
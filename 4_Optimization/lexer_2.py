@@ -1,7 +1,18 @@
 import pdb
+import os
 import re
+import mmap
 import enum
+import gc
 import sys
+import time
+import types
+import array
+import bisect
+import codecs
+import functools
+import itertools
+import importlib.util
 
 class LexerState(enum.Enum):
     START = 'START'
@@ -26,28 +37,345 @@ class TokenType(enum.Enum):
     ERROR = 'ERROR'
 
 
+HANA_KEYWORDS = ("함수", "만약에", "만약", "아니면", "동안에", "반환", "출력", "진실", "거짓", "널")
+HANA_LOGICAL = ("그리고", "이거나")
+HANA_LIST = ("배열", "길이", "추가", "뽑기", "확장", "정렬")
+HANA_DICTIONARY = ("딕셔너리", "키", "아이템")
+HANA_MATH = ("랜덤", "절댓값", "최소값", "최대값")
+
+# word -> TokenType for every reserved word, built once and shared by all lexers.
+# Any other identifier is an IDENTIFIER.
+WORD_TYPES = types.MappingProxyType(dict(
+    [(word, TokenType.KEYWORD) for word in HANA_KEYWORDS + HANA_LIST + HANA_DICTIONARY + HANA_MATH] +
+    [(word, TokenType.OPERATOR) for word in HANA_LOGICAL]
+))
+
+
+class SymbolTable:
+    # Interns identifier names to small integer symbol ids. Later phases key their tables by the id,
+    # and name() gives the text back for code generation. Each compilation has its own table: the
+    # Lexer makes one unless it is given one, and Parser passes its table on to code generation.
+    def __init__(self):
+        self.ids = {}       # name -> symbol id
+        self.names = []     # symbol id -> name
+
+    def intern(self, name):
+        symbol = self.ids.get(name)
+        if symbol is None:
+            symbol = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return symbol
+
+    def name(self, symbol):
+        return self.names[symbol]
+
+    def __len__(self):
+        return len(self.names)
+
+
+class CharClass(enum.IntEnum):
+    SPACE = 0
+    DIGIT = 1
+    ALPHA = 2
+    UNDERSCORE = 3
+    QUOTE = 4
+    HASH = 5
+    OPERATOR = 6
+    DELIMITER = 7
+    OTHER = 8
+
+
+# Identifier letters: the Hangul Jamo, Hangul Compatibility Jamo and precomposed syllable ranges from
+# the README, plus ASCII letters, which the sample programs use for names like x and n
+HANGUL_RANGES = ((0x1100, 0x11FF), (0x3130, 0x318F), (0xAC00, 0xD7AF))
+LETTER_RANGES = ((ord('A'), ord('Z')), (ord('a'), ord('z'))) + HANGUL_RANGES
+LETTERS = ''.join('{}-{}'.format(chr(first), chr(last)) for first, last in LETTER_RANGES)   # for regex classes
+
+# The characters of the Basic Multilingual Plane for which str.isspace() is true (unchanged since
+# Unicode 6.3), so the table below does not have to call it 65536 times on every import
+SPACE_RANGES = ((0x09, 0x0D), (0x1C, 0x20), (0x85, 0x85), (0xA0, 0xA0), (0x1680, 0x1680), (0x2000, 0x200A),
+                (0x2028, 0x2029), (0x202F, 0x202F), (0x205F, 0x205F), (0x3000, 0x3000))
+
+
+def build_char_table():
+    # CharClass of every character in the Basic Multilingual Plane, one byte each
+    table = bytearray([CharClass.OTHER]) * 0x10000
+    for ranges, char_class in ((SPACE_RANGES, CharClass.SPACE), (LETTER_RANGES, CharClass.ALPHA)):
+        for first, last in ranges:
+            table[first:last + 1] = bytes([char_class]) * (last - first + 1)
+    for chars, char_class in (('0123456789', CharClass.DIGIT), ('_', CharClass.UNDERSCORE),
+                              ('"', CharClass.QUOTE), ('#', CharClass.HASH),
+                              ('+-*=!<>%/', CharClass.OPERATOR), ('(){}[],:.', CharClass.DELIMITER)):
+        for char in chars:
+            table[ord(char)] = char_class
+    return bytes(table)
+
+
+CHAR_TABLE = build_char_table()
+OTHER_CLASS = int(CharClass.OTHER)
+
+# NumPy and the arrays of the numpy engine, set by load_numpy() when the first Lexer(engine="numpy")
+# is created, so that other runs never pay for importing NumPy
+numpy = None
+CLASS_ARRAY = None
+RUN_GROUPS = None
+
+
+def load_numpy():
+    global numpy, CLASS_ARRAY, RUN_GROUPS
+    if numpy is not None:
+        return
+    import numpy as module
+    CLASS_ARRAY = module.frombuffer(CHAR_TABLE, dtype=module.uint8)
+    # run group of each CharClass: digits, letters and underscores all continue an identifier
+    RUN_GROUPS = module.array([0, 1, 1, 1, 4, 5, 6, 7, 8], dtype=module.uint8)
+    numpy = module
+
+
+def char_class(char):
+    # CharClass value (a plain int) of char; characters outside the table are never valid
+    code = ord(char)
+    return CHAR_TABLE[code] if code < 0x10000 else OTHER_CLASS
+
+
+# Master pattern for the regex engine: one named group per token class, tried in the same order
+# as the START state of tokenize_nxt. NUMBER mirrors handle_digit: an integer part that may run into
+# letters, then either a fraction or a single dot that is consumed but dropped. The master patterns
+# are compiled the first time they are used, since most runs need neither.
+@functools.cache
+def token_pattern():
+    return re.compile(r'''
+    (?P<SPACE>\s+)
+  | (?P<NUMBER>(?P<INTEGER>[0-9][0-9{letters}]*)(?:(?P<FRACTION>\.[0-9][0-9{letters}]*)|(?P<DROPPED_DOT>\.(?![.0-9])))?)
+  | (?P<IDENTIFIER>[{letters}][0-9{letters}_]*)
+  | (?P<STRING>"[^"]*"?)
+  | (?P<COMMENT>\#[^\n]*)
+  | (?P<OPERATOR>[-+*=!<>%/](?:[=<>*]|.)?)
+  | (?P<DELIMITER>[(){{}}\[\],:.])
+  | (?P<ERROR>.)
+'''.format(letters=LETTERS), re.VERBOSE | re.DOTALL)
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+IDENTIFIER_TAIL_PATTERN = re.compile('[0-9{}_]*'.format(LETTERS))
+
+def byte_class(first, last):
+    # regex class for the byte values first..last, spelled out as escapes
+    if first == last:
+        return '\\x{:02x}'.format(first)
+    return '[\\x{:02x}-\\x{:02x}]'.format(first, last)
+
+
+def byte_range(low, high):
+    # regex for the byte strings of one length from low to high, in the byte order UTF-8 shares
+    # with code points
+    if len(low) == 1:
+        return byte_class(low[0], high[0])
+    if low[0] == high[0]:
+        return '{}(?:{})'.format(byte_class(low[0], low[0]), byte_range(low[1:], high[1:]))
+    # lead bytes whose continuations run over the whole 0x80-0xbf range share one class
+    tail = len(low) - 1
+    first, last = low[0], high[0]
+    alternatives = []
+    if low[1:] != b'\x80' * tail:
+        alternatives.append('{}(?:{})'.format(byte_class(first, first), byte_range(low[1:], b'\xbf' * tail)))
+        first += 1
+    if high[1:] != b'\xbf' * tail:
+        last -= 1
+    if first <= last:
+        alternatives.append(byte_class(first, last) + byte_class(0x80, 0xbf) * tail)
+    if last < high[0]:
+        alternatives.append('{}(?:{})'.format(byte_class(high[0], high[0]), byte_range(b'\x80' * tail, high[1:])))
+    return '|'.join(alternatives)
+
+
+def utf8_pattern(ranges):
+    # regex over bytes matching the UTF-8 encoding of one code point from any of ranges
+    alternatives = []
+    for first, last in ranges:
+        for low, high in ((0, 0x7F), (0x80, 0x7FF), (0x800, 0xFFFF), (0x10000, 0x10FFFF)):
+            if max(first, low) <= min(last, high):
+                alternatives.append(byte_range(chr(max(first, low)).encode('utf-8'), chr(min(last, high)).encode('utf-8')))
+    return '|'.join(alternatives)
+
+
+# token_pattern() over UTF-8 bytes, for lexing a file without decoding it. Letters and whitespace are
+# their multi-byte encodings; any other non-ASCII sequence is one ERROR character.
+@functools.cache
+def byte_token_pattern():
+    return re.compile(r'''
+    (?P<SPACE>(?:{space})+)
+  | (?P<NUMBER>(?P<INTEGER>[0-9](?:[0-9]|{letter})*)(?:(?P<FRACTION>\.[0-9](?:[0-9]|{letter})*)|(?P<DROPPED_DOT>\.(?![.0-9])))?)
+  | (?P<IDENTIFIER>(?:{letter})(?:[0-9_]|{letter})*)
+  | (?P<STRING>"[^"]*"?)
+  | (?P<COMMENT>\#[^\n]*)
+  | (?P<OPERATOR>[-+*=!<>%/](?:[=<>*]|{char})?)
+  | (?P<DELIMITER>[(){{}}\[\],:.])
+  | (?P<ERROR>{char})
+'''.format(space=utf8_pattern(SPACE_RANGES), letter=utf8_pattern(LETTER_RANGES),
+           char=r'[\x00-\x7f]|[\x80-\xff][\x80-\xbf]*').encode('ascii'), re.VERBOSE | re.DOTALL)
+
+# Everything a newline can be part of: strings, comments, and an operator followed by a character
+# that matters (handle_operator consumes it, whatever it is). Scanned from the start of the source,
+# the matches show which newlines are safe places to split it for parallel lexing.
+SPLIT_PATTERN = re.compile(r'"[^"]*"?|\#[^\n]*|[-+*=!<>%/][-+*=!<>%/"#\n]')
+
+# closing bracket -> the opening bracket it matches
+BRACKET_PAIRS = {')': '(', '}': '{', ']': '['}
+
+# Version of the token stream; bump it whenever the tokens for some input change, since token_cache
+# keys cached tokens by it (along with TOKEN_TYPES, whose order gives the type codes)
+LEXER_VERSION = 1
+
+# lexer engines selectable with Lexer(engine=...)
+ENGINES = ("state", "dfa", "regex") + (("numpy",) if importlib.util.find_spec("numpy") is not None else ())
+
+# tokenize_parallel gives each worker at least this many characters
+PARALLEL_MIN_CHUNK = 1 << 16
+
+# TokenType of each type code in TokenEncoder results
+TOKEN_TYPES = tuple(TokenType)
+TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+
+
+class LineIndex:
+    # Offsets at which each line of the source starts, found with one str.find sweep.
+    # line_column() turns any offset into a 1-based (line, column) with a binary search.
+    def __init__(self, text=""):
+        self.starts = array.array('q', [0])
+        self.length = 0
+        self.append(text)
+
+    def append(self, text):
+        # index text, which continues the source at offset self.length
+        pos = text.find('\n')
+        while pos != -1:
+            self.starts.append(self.length + pos + 1)
+            pos = text.find('\n', pos + 1)
+        self.length += len(text)
+
+    def line_column(self, offset):
+        line = bisect.bisect_right(self.starts, offset)
+        return line, offset - self.starts[line - 1] + 1
+
+    def replace(self, start, end, text):
+        # update the index for the source text [start, end) replaced by text; every line start after
+        # the edit is shifted, so this is linear in the number of lines
+        starts = self.starts
+        first = bisect.bisect_right(starts, start)
+        last = bisect.bisect_right(starts, end)
+        delta = len(text) - (end - start)
+        added = array.array('q')
+        pos = text.find('\n')
+        while pos != -1:
+            added.append(start + pos + 1)
+            pos = text.find('\n', pos + 1)
+        added.extend(line_start + delta for line_start in starts[last:])
+        starts[first:] = added
+        self.length += delta
+
+
+class ByteLineIndex(LineIndex):
+    # LineIndex over a UTF-8 buffer: offsets are byte offsets, columns still count characters
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.starts = array.array('q', [0])
+        self.length = len(buffer)
+        pos = buffer.find(b'\n')
+        while pos != -1:
+            self.starts.append(pos + 1)
+            pos = buffer.find(b'\n', pos + 1)
+
+    def line_column(self, offset):
+        line = bisect.bisect_right(self.starts, offset)
+        start = self.starts[line - 1]
+        return line, len(self.buffer[start:offset].decode('utf-8')) + 1
+
+
 class Token:
-    def __init__(self, type, value):
+    # __slots__ keeps tokens small, since every token of a program stays alive until parsing is done
+    __slots__ = ('type', 'value', 'symbol', 'offset', 'lines')
+
+    def __init__(self, type, value, symbol=None, offset=None, lines=None):
         self.type = type
         self.value = value
+        self.symbol = symbol    # SymbolTable id for IDENTIFIER tokens
+        self.offset = offset    # source offset of the first character, filled in by the lexer
+        self.lines = lines      # LineIndex of the source, filled in by the lexer
+
+    @property
+    def line(self):
+        return self.lines.line_column(self.offset)[0] if self.lines is not None else None
+
+    @property
+    def column(self):
+        return self.lines.line_column(self.offset)[1] if self.lines is not None else None
 
     def __repr__(self):
         return ('Token({}, {})'.format(self.type, self.value))
 
 
+class SpanToken(Token):
+    # Token that keeps (start, end) offsets into the source and slices its value on first access,
+    # used for strings and comments, which can be long and are often never looked at
+    __slots__ = ('source', 'start', 'end')
+
+    def __init__(self, type, source, start, end):
+        self.type = type
+        self.source = source
+        self.start = start
+        self.end = end
+        self.symbol = None
+        self.offset = None
+        self.lines = None
+
+    def __getattr__(self, name):
+        # only called while the value slot is still empty
+        if name == 'value':
+            value = self.value = self.source[self.start:self.end]
+            return value
+        raise AttributeError(name)
+
+
+class ByteSpanToken(SpanToken):
+    # SpanToken over a UTF-8 buffer, decoding its value on first access
+    __slots__ = ()
+
+    def __getattr__(self, name):
+        if name == 'value':
+            value = self.value = self.source[self.start:self.end].decode('utf-8')
+            return value
+        raise AttributeError(name)
+
+
 class Lexer:
-    def __init__(self):
+    def __init__(self, engine="state", stats=False, symbols=None):
+        if engine == "numpy" and engine not in ENGINES:
+            raise ValueError("The numpy lexer engine needs NumPy installed")
+        if engine not in ENGINES:
+            raise ValueError("Unknown lexer engine: {}".format(engine))
+        if engine == "numpy":
+            load_numpy()
+        self.engine = engine
         self.state = LexerState.START
         self.input = ""
         self.position = 0       # for simple string input
-        self.line = 1           # for code with multiple lines
-        self.column = 1
-        self.hana_keywords = ["함수", "만약에", "만약", "아니면", "동안에", "반환", "출력", "진실", "거짓", "널"]
-        self.hana_logical = ["그리고", "이거나"]
-        self.hana_list = ["배열", "길이", "추가", "뽑기", "확장", "정렬"]
-        self.hana_dictionary = ["딕셔너리", "키", "아이템"]
-        self.hana_math = ["랜덤", "절댓값", "최소값", "최대값"]
+        self.base = 0           # source offset of self.input[0], moves on as a streamed input is consumed
+        self.lines = LineIndex()
+        self.hana_keywords = HANA_KEYWORDS
+        self.hana_logical = HANA_LOGICAL
+        self.hana_list = HANA_LIST
+        self.hana_dictionary = HANA_DICTIONARY
+        self.hana_math = HANA_MATH
         self.hana_delimiter = []
+        self.symbols = SymbolTable() if symbols is None else symbols     # ids of IDENTIFIER tokens
+        self.comments = []      # COMMENT tokens set aside by tokenize_code
+        self.brackets = {}      # tokenize_code: index of each opening bracket -> index of its partner
+        self.stats = None
+        if stats:
+            # Counting is only switched in when asked for, so a plain Lexer runs the same code as before
+            self.stats = {"engine": engine, "characters": 0, "seconds": 0.0, "tokens": {}, "transitions": {},
+                          "cache_hits": 0}
+            self.transition_state = self.count_transition
 
 
     def lookahead(self):
@@ -57,12 +385,6 @@ class Lexer:
 
         char = self.input[self.position]
         self.position += 1
-        self.column += 1
-
-        # reach to the end of the line
-        if char == '\n':
-            self.line += 1
-            self.column = 1
         return char
 
 
@@ -72,28 +394,409 @@ class Lexer:
 
 
     def tokenize(self, input_string):
+        return list(self.iter_tokens(input_string))
+
+
+    def tokenize_code(self, input_string):
+        # tokenize without the comments, which are kept in self.comments (with their positions)
+        # for tools that want them. self.brackets maps the index of every matched '(', '{' or '['
+        # in the result to the index of its partner, pairing them the way handle_delimiter does.
+        code = []
+        comments = self.comments = []
+        brackets = self.brackets = {}
+        opened = []
+        comment = TokenType.COMMENT
+        delimiter = TokenType.DELIMITER
+        for token in self.iter_tokens(input_string):
+            if token.type is comment:
+                comments.append(token)
+                continue
+            if token.type is delimiter:
+                value = token.value
+                if value in '({[':
+                    opened.append((value, len(code)))
+                elif value in ')}]' and opened and opened[-1][0] == BRACKET_PAIRS[value]:
+                    brackets[opened.pop()[1]] = len(code)
+            code.append(token)
+        return code
+
+
+    def iter_code_tokens(self, input_string):
+        # tokenize_code one token at a time. Comments still go to self.comments, but self.brackets
+        # stays empty, since pairing brackets needs the whole token list.
+        self.comments = []
+        self.brackets = {}
+        return self.without_comments(self.iter_tokens(input_string))
+
+
+    def without_comments(self, tokens):
+        comments = self.comments
+        comment = TokenType.COMMENT
+        for token in tokens:
+            if token.type is comment:
+                comments.append(token)
+            else:
+                yield token
+
+
+    def iter_tokens(self, input_string):
+        # Yield tokens one at a time with the selected engine instead of building a list
+        self.lines = LineIndex(input_string)
+        if self.engine == "dfa":
+            return self.measure(self.iter_dfa(input_string))
+        elif self.engine == "regex":
+            return self.measure(self.iter_regex(input_string))
+        elif self.engine == "numpy":
+            return self.measure(self.iter_numpy(input_string))
+        return self.measure(self.iter_state(input_string))
+
+
+    def measure(self, tokens):
+        # tokens as they are, or counted and timed into self.stats when the lexer was created with stats
+        if self.stats is None:
+            return tokens
+        return self.count_tokens(tokens)
+
+
+    def count_tokens(self, tokens):
+        # Only the time spent producing each token is counted, not the consumer's
+        stats = self.stats
+        counts = stats["tokens"]
+        clock = time.perf_counter
+        scanned = self.base + self.position
+        elapsed = 0.0
+        try:
+            while True:
+                start = clock()
+                token = next(tokens, None)
+                elapsed += clock() - start
+                if token is None:
+                    break
+                name = token.type.value
+                counts[name] = counts.get(name, 0) + 1
+                yield token
+        finally:
+            stats["seconds"] += elapsed
+            stats["characters"] += self.base + self.position - scanned
+
+
+    def count_transition(self, new_state):
+        # transition_state when stats are on
+        transitions = self.stats["transitions"]
+        transitions[new_state.value] = transitions.get(new_state.value, 0) + 1
+        self.state = new_state
+
+
+    def tokenize_parallel(self, input_string, workers=4, executor=None):
+        # Same tokens as tokenize, lexed in up to `workers` processes. The input is cut after newlines
+        # where the lexer is back in its START state; pass an executor to reuse a pool across calls.
+        parts = min(workers, len(input_string) // PARALLEL_MIN_CHUNK)
+        points = split_points(input_string, parts) if parts > 1 else []
+        if not points:
+            return self.tokenize(input_string)
+
+        bounds = [0] + points + [len(input_string)]
+        chunks = [input_string[bounds[i]:bounds[i + 1]] for i in range(len(points) + 1)]
+        if executor is None:
+            import concurrent.futures
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(lex_chunk, chunks, bounds, itertools.repeat(self.engine)))
+        else:
+            results = list(executor.map(lex_chunk, chunks, bounds, itertools.repeat(self.engine)))
+        if self.stats is None:
+            return self.stitch_tokens(input_string, results)
+        self.position = 0
+        return list(self.measure(self.iter_stitched(input_string, results)))
+
+
+    def iter_stitched(self, input_string, results):
+        # stitch_tokens for count_tokens, which times and counts a token iterator
+        yield from self.stitch_tokens(input_string, results)
+
+
+    def stitch_tokens(self, input_string, results):
+        # Adopt the lex_chunk results, in input order, as one token list. Tokens hold no reference
+        # cycles, so the garbage collector is paused meanwhile: its passes over the growing list
+        # would cost more than building it.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return self.adopt_results(input_string, results)
+        finally:
+            if enabled:
+                gc.enable()
+
+
+    def adopt_results(self, input_string, results):
+        # Only what depends on the whole input is redone here, once per unclosed bracket rather than
+        # per token: the open delimiters and the stuck ERROR state after the first error. The tokens
+        # themselves come from decode_tokens.
         self.input = input_string
+        self.base = 0
+        lines = self.lines = LineIndex(input_string)
         tokens = []
+        for encoded, closed, opened, error in results:
+            tokens.extend(decode_tokens(encoded, input_string, lines, self.symbols))
+
+            for delimiter in closed:
+                self.track_delimiter(delimiter, None)
+            for delimiter, offset in opened:
+                self.track_delimiter(delimiter, offset)
+
+            if error is not None:
+                self.transition_state(LexerState.ERROR)
+                token = self.error_token(error)
+                token.offset = error
+                token.lines = lines
+                tokens.append(token)
+                # every character after the first error is an error, whatever the later chunks say
+                self.position = error + 1
+                tokens.extend(self.iter_regex(input_string))
+                return tokens
+        self.position = len(input_string)
+        return tokens
+
+
+    def relex(self, tokens, start, end, new_text):
+        # Patch tokens, the result of tokenizing self.input, for self.input[start:end] replaced by
+        # new_text, and return them. Lexing restarts at a token just before the edit and stops as
+        # soon as a token starts where an old one did; the old tokens after it are reused with their
+        # offsets shifted. Strings and comments on either side of the edit are moved onto the new
+        # source, so the old one is not kept alive. Those passes, and the shift in LineIndex.replace,
+        # still visit every token and line, so an edit costs time linear in the size of the file,
+        # though with no lexing in it.
+        # hana_delimiter is left as the last full tokenize made it.
+        old_input = self.input
+        source = old_input[:start] + new_text + old_input[end:]
+        delta = len(new_text) - (end - start)
+        if self.state == LexerState.ERROR:
+            # everything after the old error was an error token, nothing is worth keeping
+            self.state = LexerState.START
+            self.position = 0
+            tokens[:] = self.tokenize(source)
+            return tokens
+
+        # A token can look one character past the start of the next (NUMBER checks for a second dot),
+        # so the tokens kept in front of the restart must start before start - 1.
+        first = bisect.bisect_left(tokens, start - 1, key=lambda token: token.offset) - 1
+        if first < 0:
+            first = 0
+            self.position = 0
+        else:
+            self.position = tokens[first].offset
+        self.base = 0
+        self.lines.replace(start, end, new_text)
+        delimiters = self.hana_delimiter
+        self.hana_delimiter = []
+
+        # Scanning resumes with token_pattern() whatever the engine, as in iter_file_tokens
+        resync = len(tokens)
+        old = first
+        edit_end = start + len(new_text)
+        patch = []
+        for token in self.measure(self.iter_regex(source)):
+            if token.offset >= edit_end and self.state == LexerState.START:
+                old_offset = token.offset - delta
+                while old < len(tokens) and tokens[old].offset < old_offset:
+                    old += 1
+                if old < len(tokens) and tokens[old].offset == old_offset:
+                    resync = old
+                    break
+            patch.append(token)
+
+        for token in itertools.islice(tokens, resync, None):
+            offset = token.offset = token.offset + delta
+            if type(token) is SpanToken:
+                token.end += offset - token.start
+                token.start = offset
+                token.source = source
+        for token in itertools.islice(tokens, first):
+            if type(token) is SpanToken:
+                token.source = source   # start and end still hold, nothing before the edit moved
+        tokens[first:resync] = patch
+        self.hana_delimiter = delimiters
+        self.input = source
+        self.position = len(source)
+        return tokens
+
+
+    def iter_file_tokens(self, file, chunk_size=65536):
+        # Yield tokens from a text file object read chunk_size characters at a time.
+        # Chunks are scanned with token_pattern() whatever the engine, since resuming across a chunk
+        # boundary needs the end offset of every token before its side effects are applied.
+        buffer = ""
+        self.lines = LineIndex()
+        while True:
+            chunk = file.read(chunk_size)
+            buffer = self.feed_chunk(buffer, chunk)
+            yield from self.measure(self.iter_regex(buffer, final=not chunk))
+            if not chunk:
+                return
+
+
+    async def aiter_stream_tokens(self, reader, chunk_size=65536):
+        # iter_file_tokens for an asyncio.StreamReader of UTF-8 bytes (a pipe or a socket): tokens are
+        # yielded as data arrives, and other tasks on the event loop run while the lexer waits for more
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        buffer = ""
+        self.lines = LineIndex()
+        while True:
+            data = await reader.read(chunk_size)
+            buffer = self.feed_chunk(buffer, decoder.decode(data, final=not data))
+            for token in self.measure(self.iter_regex(buffer, final=not data)):
+                yield token
+            if not data:
+                return
+
+
+    async def tokenize_stream(self, reader, chunk_size=65536):
+        return [token async for token in self.aiter_stream_tokens(reader, chunk_size)]
+
+
+    def feed_chunk(self, buffer, chunk):
+        # buffer for the next streamed scan: what is left of buffer after self.position, plus chunk
+        self.lines.append(chunk)
+        if self.position:
+            # drop the text already tokenized
+            self.base += self.position
+            buffer = buffer[self.position:]
+            self.position = 0
+        return buffer + chunk
+
+
+    def tokenize_file(self, path):
+        return list(self.iter_mmap_tokens(path))
+
+
+    def iter_mmap_tokens(self, path):
+        # Yield the tokens of the UTF-8 file at path, scanned as bytes from an mmap of the file
+        # instead of a decoded copy. Token offsets are byte offsets into the file.
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = b""
+        return self.measure(self.iter_bytes(buffer))
+
+
+    def iter_bytes(self, buffer):
+        # Tokens of a UTF-8 bytes-like buffer: byte_token_pattern() does the scanning, and only the
+        # text of identifiers, numbers, operators and delimiters is decoded. Strings and comments
+        # decode their values when first read.
+        self.input = buffer
+        self.base = 0
+        self.lines = ByteLineIndex(buffer)
+        words = {}      # identifier bytes -> (type, value, symbol), so each word is decoded once
+        if self.state != LexerState.ERROR:
+            for match in byte_token_pattern().finditer(buffer, self.position):
+                kind = match.lastgroup
+                self.position = match.end()
+                if kind == 'SPACE':
+                    continue
+                start = match.start()
+                if kind == 'IDENTIFIER':
+                    word = match.group()
+                    entry = words.get(word)
+                    if entry is None:
+                        token = self.identifier_token(word.decode('utf-8'))
+                        entry = words[word] = (token.type, token.value, token.symbol)
+                    token = Token(*entry)
+                elif kind == 'NUMBER':
+                    token = self.byte_number(match)
+                elif kind == 'OPERATOR':
+                    # the character after an operator is always consumed, as in handle_operator
+                    value = match.group()
+                    if len(value) > 1 and value[1:] not in b'=<>*':
+                        value = value[:1]
+                    token = Token(TokenType.OPERATOR, value.decode('ascii'))
+                elif kind == 'DELIMITER':
+                    value = match.group().decode('ascii')
+                    self.track_delimiter(value, start)
+                    token = Token(TokenType.DELIMITER, value)
+                elif kind == 'STRING' or kind == 'COMMENT':
+                    token = ByteSpanToken(TokenType[kind], buffer, start, self.position)
+                else:
+                    self.transition_state(LexerState.ERROR)
+                    line, column = self.lines.line_column(start)
+                    token = Token(TokenType.ERROR, "Unexpected character: {} at line {}, column {}".format(match.group().decode('utf-8'), line, column))
+                token.offset = start
+                token.lines = self.lines
+                yield token
+                if kind == 'ERROR':
+                    break
+
+        # Like tokenize_nxt, once an unexpected character is seen every following character is an error
+        if self.state == LexerState.ERROR:
+            offset = self.position
+            for char in buffer[offset:].decode('utf-8'):
+                token = Token(TokenType.ERROR, "Unexpected character: {}".format(char))
+                token.offset = offset
+                token.lines = self.lines
+                offset += len(char.encode('utf-8'))
+                yield token
+            self.position = offset
+
+
+    def byte_number(self, match):
+        # regex_number for byte_token_pattern() matches
+        integer, fraction = match.group('INTEGER', 'FRACTION')
+        if match.group('DROPPED_DOT') is not None:
+            return Token(TokenType.NUMBER, integer.decode('utf-8'))
+
+        value = (integer if fraction is None else integer + fraction).decode('utf-8')
+        end = match.end()
+        if self.input[end:end + 1] == b'.':
+            return Token(TokenType.NUMBER, value)
+        if integer.isdigit() and (fraction is None or fraction[1:].isdigit()):
+            return Token(TokenType.NUMBER, value)
+        return self.identifier_token(value)
+
+
+    def iter_state(self, input_string):
+        self.input = input_string
         while True:
             token = self.tokenize_nxt()
             if token is None:
                 break
-            tokens.append(token)
-        return tokens
+            yield token
     
 
+    def skip_whitespace(self):
+        # Jump over a whole run of whitespace in one step
+        match = WHITESPACE_PATTERN.match(self.input, self.position)
+        if match is not None:
+            self.position = match.end()
+
+
+    def line_column(self, pos):
+        # line and column of self.input[pos]
+        return self.lines.line_column(self.base + pos)
+
+
     def tokenize_nxt(self):
+        if self.state == LexerState.START:
+            self.skip_whitespace()
+
+        start = self.position
+        token = self.tokenize_char()
+        if token is not None:
+            token.offset = self.base + start
+            token.lines = self.lines
+        return token
+
+
+    def tokenize_char(self):
         char = self.lookahead()   
         if char is None:
             return None
         
         if self.state == LexerState.START:
-            if char.isspace():
-                return self.tokenize_nxt()  # Skip whitespace
-            elif char.isdigit():
+            code = ord(char)
+            start_class = CHAR_TABLE[code] if code < 0x10000 else OTHER_CLASS
+            if start_class == CharClass.DIGIT:
                 self.transition_state(LexerState.IN_NUMBER)
                 return self.handle_digit(char)
-            elif char.isalpha():
+            elif start_class == CharClass.ALPHA:
                 self.transition_state(LexerState.IN_IDENTIFIER)
                 return self.handle_identifier(char)
             elif char == '"':
@@ -110,7 +813,7 @@ class Lexer:
                 return self.handle_delimiter(char) 
             else:
                 self.transition_state(LexerState.ERROR)
-                return Token(TokenType.ERROR, "Unexpected character: {} at line {}, column {}".format(char, self.line, self.column))
+                return self.error_token(self.position - 1)
 
         elif self.state == LexerState.IN_NUMBER:
             return self.handle_digit(char)
@@ -134,7 +837,7 @@ class Lexer:
 
 
     def handle_digit(self, digit_src):
-        value = digit_src
+        start = self.position - 1   # digit_src has already been consumed
         dot_encountered = False
         is_error = False  # Flag to indicate if there's an error in the digit sequence
 
@@ -154,27 +857,31 @@ class Lexer:
                 if next_char == '.':
                     self.transition_state(LexerState.START)
                     self.position -= 1
-                    return Token(TokenType.NUMBER, value)
-                elif next_char.isdigit():
-                    value += '.'
+                    return Token(TokenType.NUMBER, self.input[start:self.position])
+                elif next_char is not None and char_class(next_char) == CharClass.DIGIT:
+                    continue    # the dot is part of the number
                 else:
                     self.transition_state(LexerState.START)
-                    return Token(TokenType.NUMBER, value)
+                    return Token(TokenType.NUMBER, self.input[start:self.position - 1])
             elif char == '.' and dot_encountered:
                 self.transition_state(LexerState.START)
-                return Token(TokenType.NUMBER, value)
-            elif char.isdigit():
-                value += self.lookahead()
-            elif char.isalpha():
-                value += self.lookahead()
-                is_error = True  # Mark this as an error since a digit was followed by a letter
+                return Token(TokenType.NUMBER, self.input[start:self.position])
             else:
-                self.transition_state(LexerState.START)
-                break
+                code = ord(char)
+                next_class = CHAR_TABLE[code] if code < 0x10000 else OTHER_CLASS
+                if next_class == CharClass.DIGIT:
+                    self.lookahead()
+                elif next_class == CharClass.ALPHA:
+                    self.lookahead()
+                    is_error = True  # Mark this as an error since a digit was followed by a letter
+                else:
+                    self.transition_state(LexerState.START)
+                    break
 
+        value = self.input[start:self.position]
         if is_error:
             self.transition_state(LexerState.START)
-            return Token(TokenType.IDENTIFIER, value)
+            return self.identifier_token(value)
 
         return Token(TokenType.NUMBER, value)
 
@@ -189,35 +896,29 @@ class Lexer:
     
 
     def handle_string(self, str_src):
-        value = str_src
-        while True:
-            char = self.lookahead()
-            if char is None:
-                self.transition_state(LexerState.START)
-                break
-
-            value += char
-            if char == '"':
-                self.transition_state(LexerState.START)
-                break
-        return Token(TokenType.STRING, value)
+        start = self.position - 1   # the opening quote has already been consumed
+        end = self.input.find('"', self.position)
+        end = len(self.input) if end == -1 else end + 1
+        self.position = end
+        self.transition_state(LexerState.START)
+        return SpanToken(TokenType.STRING, self.input, start, end)
     
 
     def handle_comment(self, str_src):
-        value = str_src
-        while self.position < len(self.input):
-            char = self.input[self.position]
-            if char == '\n':
-                self.transition_state(LexerState.START)
-                break
-            value += self.lookahead()
-        return Token(TokenType.COMMENT, value)
+        start = self.position - 1   # '#' has already been consumed
+        end = self.input.find('\n', self.position)
+        if end == -1:
+            end = len(self.input)
+        else:
+            self.transition_state(LexerState.START)
+        self.position = end
+        return SpanToken(TokenType.COMMENT, self.input, start, end)
     
     
     def handle_delimiter(self, delimiter):
-        start_column = self.column - 1
         if delimiter in '({[':
-            self.hana_delimiter.append((delimiter, self.line, start_column))
+            line, column = self.line_column(self.position - 1)
+            self.hana_delimiter.append((delimiter, line, column))
         elif delimiter in ')}]':
             if self.hana_delimiter:
                 last_delimiter = self.hana_delimiter[-1][0]
@@ -230,49 +931,441 @@ class Lexer:
     
 
     def handle_identifier(self, id_src):
-        value = id_src
-        is_error = False  # Flag to indicate if there's an error in the identifier
+        start = self.position - 1   # id_src has already been consumed
+        end = IDENTIFIER_TAIL_PATTERN.match(self.input, self.position).end()
+        self.position = end
+        self.transition_state(LexerState.START)
+        return self.identifier_token(self.input[start:end])
 
-        while True:
-            if self.position < len(self.input):
-                char = self.input[self.position]
+
+    def identifier_token(self, value):
+        # Check if the identifier is a keyword or falls into other predefined categories
+        word_type = WORD_TYPES.get(value)
+        if word_type is not None:
+            return Token(word_type, value)
+        # every occurrence of a name shares one string and one symbol id
+        symbol = self.symbols.intern(value)
+        return Token(TokenType.IDENTIFIER, self.symbols.names[symbol], symbol=symbol)
+
+
+    # Table-driven engine: a character class x LexerState table picks the action for the
+    # next character, and each action scans a whole token with slicing instead of value += char.
+    # Actions return (token, position after the token); None in the table means skip the char.
+    def dfa_table(self):
+        start = (
+            None,                   # SPACE
+            self.dfa_number,        # DIGIT
+            self.dfa_identifier,    # ALPHA
+            self.dfa_error,         # UNDERSCORE
+            self.dfa_string,        # QUOTE
+            self.dfa_comment,       # HASH
+            self.dfa_operator,      # OPERATOR
+            self.dfa_delimiter,     # DELIMITER
+            self.dfa_error,         # OTHER
+        )
+        # Like tokenize_nxt, once an unexpected character is seen every following character is an error
+        error = (self.dfa_stuck,) * len(CharClass)
+        return {LexerState.START: start, LexerState.ERROR: error}
+
+
+    def iter_dfa(self, input_string):
+        self.input = input_string
+        n = len(input_string)
+        pos = self.position
+        classes = CHAR_TABLE
+        table = self.dfa_table()
+        row = table[self.state]
+        while pos < n:
+            code = ord(input_string[pos])
+            action = row[classes[code] if code < 0x10000 else OTHER_CLASS]
+            if action is None:
+                # single spaces are stepped over, longer runs are skipped in one jump
+                pos += 1
+                if pos < n and input_string[pos].isspace():
+                    pos = WHITESPACE_PATTERN.match(input_string, pos).end()
+                continue
+            token, end = action(input_string, pos)
+            token.offset = pos
+            token.lines = self.lines
+            self.position = pos = end
+            yield token
+            row = table[self.state]
+        self.position = pos
+
+
+    # NumPy engine: one vectorized pass classifies every character and finds where each run of
+    # whitespace or identifier characters ends; the DFA actions then only run once per token
+    def iter_numpy(self, input_string):
+        self.input = input_string
+        n = len(input_string)
+        codes = numpy.frombuffer(input_string.encode('utf-32-le', 'surrogatepass'), dtype=numpy.uint32)
+        classes = CLASS_ARRAY[numpy.minimum(codes, 0xFFFF)]     # CHAR_TABLE[0xFFFF] is OTHER
+        run_ends = numpy.append(numpy.flatnonzero(numpy.diff(RUN_GROUPS[classes])) + 1, n).tolist()
+        classes = classes.tobytes()
+
+        table = self.dfa_table()
+        identifier = table[LexerState.START][CharClass.ALPHA]
+        row = table[self.state]
+        pos = self.position
+        run = 0
+        while pos < n:
+            while run_ends[run] <= pos:
+                run += 1
+            action = row[classes[pos]]
+            if action is None:
+                pos = run_ends[run]
+                continue
+            if action is identifier:
+                end = run_ends[run]
+                token = self.identifier_token(input_string[pos:end])
             else:
-                char = None
+                token, end = action(input_string, pos)
+            token.offset = pos
+            token.lines = self.lines
+            self.position = pos = end
+            yield token
+            row = table[self.state]
+        self.position = pos
 
-            if char is None or not (char.isalnum() or char == '_'):
-                self.transition_state(LexerState.START)
+
+    def dfa_number(self, src, pos):
+        start = pos
+        n = len(src)
+        digit = int(CharClass.DIGIT)
+        alpha = int(CharClass.ALPHA)
+        dot_encountered = False
+        is_error = False
+        pos += 1
+        while pos < n:
+            char = src[pos]
+            if char == '.':
+                if dot_encountered:
+                    return Token(TokenType.NUMBER, src[start:pos]), pos
+                dot_encountered = True
+                next_char = src[pos + 1] if pos + 1 < n else None
+                if next_char is not None and char_class(next_char) == digit:
+                    pos += 1
+                elif next_char == '.':
+                    return Token(TokenType.NUMBER, src[start:pos]), pos
+                else:
+                    # the dot is consumed but not part of the number
+                    return Token(TokenType.NUMBER, src[start:pos]), pos + 1
+            else:
+                next_class = char_class(char)
+                if next_class == digit:
+                    pos += 1
+                elif next_class == alpha:
+                    pos += 1
+                    is_error = True
+                else:
+                    break
+
+        if is_error:
+            return self.identifier_token(src[start:pos]), pos
+        return Token(TokenType.NUMBER, src[start:pos]), pos
+
+
+    def dfa_identifier(self, src, pos):
+        end = IDENTIFIER_TAIL_PATTERN.match(src, pos + 1).end()
+        return self.identifier_token(src[pos:end]), end
+
+
+    def dfa_string(self, src, pos):
+        end = src.find('"', pos + 1)
+        end = len(src) if end == -1 else end + 1
+        return SpanToken(TokenType.STRING, src, pos, end), end
+
+
+    def dfa_comment(self, src, pos):
+        end = src.find('\n', pos + 1)
+        if end == -1:
+            end = len(src)
+        return SpanToken(TokenType.COMMENT, src, pos, end), end
+
+
+    def dfa_operator(self, src, pos):
+        value = src[pos]
+        pos += 1
+        # the character after an operator is always consumed, as in handle_operator
+        if pos < len(src):
+            next_char = src[pos]
+            pos += 1
+            if next_char in '=<>*':
+                value += next_char
+        return Token(TokenType.OPERATOR, value), pos
+
+
+    def dfa_delimiter(self, src, pos):
+        delimiter = src[pos]
+        self.track_delimiter(delimiter, pos)
+        return Token(TokenType.DELIMITER, delimiter), pos + 1
+
+
+    def dfa_error(self, src, pos):
+        self.transition_state(LexerState.ERROR)
+        return self.error_token(pos), pos + 1
+
+
+    def dfa_stuck(self, src, pos):
+        return Token(TokenType.ERROR, "Unexpected character: {}".format(src[pos])), pos + 1
+
+
+    def track_delimiter(self, delimiter, pos):
+        # same bookkeeping as handle_delimiter, for engines that work with offsets
+        if delimiter in '({[':
+            line, column = self.line_column(pos)
+            self.hana_delimiter.append((delimiter, line, column))
+        elif delimiter in ')}]':
+            if self.hana_delimiter:
+                last_delimiter = self.hana_delimiter[-1][0]
+                if (last_delimiter == '(' and delimiter == ')') or \
+                   (last_delimiter == '{' and delimiter == '}') or \
+                   (last_delimiter == '[' and delimiter == ']'):
+                    self.hana_delimiter.pop()
+
+
+    def error_token(self, pos):
+        line, column = self.line_column(pos)
+        return Token(TokenType.ERROR, "Unexpected character: {} at line {}, column {}".format(self.input[pos], line, column))
+
+
+    # Regex engine: token_pattern().finditer does the scanning in C, Python only runs once per token
+    def iter_regex(self, input_string, final=True):
+        # Unless final, more text may be appended to input_string later: stop before any token that
+        # ends within two characters of the end (the lookahead handle_digit needs), leaving
+        # self.position at its start so scanning can resume there.
+        self.input = input_string
+        n = len(input_string)
+        limit = n if final else n - 2
+        if self.state != LexerState.ERROR:
+            for match in token_pattern().finditer(input_string, self.position):
+                if match.end() > limit:
+                    break
+                kind = match.lastgroup
+                if kind == 'SPACE':
+                    self.position = match.end()
+                    continue
+                start = match.start()
+                self.position = match.end()
+                if kind == 'IDENTIFIER':
+                    token = self.identifier_token(match.group())
+                elif kind == 'NUMBER':
+                    token = self.regex_number(match)
+                elif kind == 'OPERATOR':
+                    # the character after an operator is always consumed, as in handle_operator
+                    value = match.group()
+                    if len(value) == 2 and value[1] not in '=<>*':
+                        value = value[0]
+                    token = Token(TokenType.OPERATOR, value)
+                elif kind == 'DELIMITER':
+                    value = match.group()
+                    self.track_delimiter(value, start)
+                    token = Token(TokenType.DELIMITER, value)
+                elif kind == 'STRING' or kind == 'COMMENT':
+                    token = SpanToken(TokenType[kind], input_string, start, self.position)
+                else:
+                    self.transition_state(LexerState.ERROR)
+                    token = self.error_token(start)
+                token.offset = self.base + start
+                token.lines = self.lines
+                yield token
+                if kind == 'ERROR':
+                    break
+
+        # Like tokenize_nxt, once an unexpected character is seen every following character is an error
+        if self.state == LexerState.ERROR:
+            while self.position < n:
+                token = Token(TokenType.ERROR, "Unexpected character: {}".format(input_string[self.position]))
+                token.offset = self.base + self.position
+                token.lines = self.lines
+                self.position += 1
+                yield token
+
+
+    def regex_number(self, match):
+        integer, fraction = match.group('INTEGER', 'FRACTION')
+        if match.group('DROPPED_DOT') is not None:
+            return Token(TokenType.NUMBER, integer)
+
+        value = integer if fraction is None else integer + fraction
+        end = match.end()
+        # handle_digit stops at a following dot without checking for letters
+        if end < len(self.input) and self.input[end] == '.':
+            return Token(TokenType.NUMBER, value)
+        if integer.isdigit() and (fraction is None or fraction[1:].isdigit()):
+            return Token(TokenType.NUMBER, value)
+        return self.identifier_token(value)
+
+
+def split_points(source, parts):
+    # Offsets just after newlines that no string, comment or operator runs across, one near each
+    # len(source) * i / parts. Lexing starts afresh in the START state at every one of them.
+    points = []
+    matches = SPLIT_PATTERN.finditer(source)
+    match = next(matches, None)
+    pos = 0
+    for part in range(1, parts):
+        pos = max(pos, len(source) * part // parts)
+        while True:
+            newline = source.find('\n', pos)
+            if newline == -1 or newline + 1 == len(source):
+                return points
+            while match is not None and match.end() <= newline:
+                match = next(matches, None)
+            if match is None or match.start() > newline:
                 break
+            pos = match.end()
+        pos = newline + 1
+        points.append(pos)
+    return points
 
-            # Check if a digit immediately follows a Korean character, which should raise an error
-            if char.isdigit() and not value[-1].isdigit() and not value[-1] == '_':
-                is_error = True  # Mark this as an error
-            value += self.lookahead()
 
-        # Check if the identifier is a keyword or falls into other predefined categories
-        if value in self.hana_keywords + self.hana_list + self.hana_dictionary + self.hana_math:
-            return Token(TokenType.KEYWORD, value)
-        elif value in self.hana_logical:
-            return Token(TokenType.OPERATOR, value)
+class TokenEncoder:
+    # Compact form of a token list, shared by tokenize_parallel's workers and token_cache: entries
+    # holds the distinct (type code, value) pairs, and indices and offsets hold each token's pair and
+    # source offset. Strings and comments are listed in spans, by token index, with their end offsets
+    # in span_ends; their text is in the source. Offsets are shifted by base. decode_tokens reverses it.
+    def __init__(self, base=0):
+        self.base = base
+        self.entries = {}
+        self.indices = array.array('I')
+        self.offsets = array.array('q')
+        self.spans = array.array('I')
+        self.span_ends = array.array('q')
+
+    def add(self, token):
+        if isinstance(token, SpanToken):
+            self.spans.append(len(self.indices))
+            self.span_ends.append(self.base + token.end)
+            entry = (TYPE_CODES[token.type], None)
+        else:
+            entry = (TYPE_CODES[token.type], token.value)
+        index = self.entries.get(entry)
+        if index is None:
+            index = self.entries[entry] = len(self.entries)
+        self.indices.append(index)
+        self.offsets.append(self.base + token.offset)
+
+    def encoded(self):
+        return list(self.entries), self.indices, self.offsets, self.spans, self.span_ends
+
+
+def decode_tokens(encoded, source, lines, symbols):
+    # The tokens of a TokenEncoder result over source. Each distinct (type code, value) pair becomes
+    # (type, value, symbol) once, interning identifiers in symbols; the tokens are built with map,
+    # without a Python loop per token. Raises IndexError or ValueError when encoded is inconsistent.
+    entries, indices, offsets, spans, span_ends = encoded
+    if len(indices) != len(offsets) or len(spans) != len(span_ends):
+        raise ValueError("encoded tokens have arrays of different lengths")
+    types, values, token_symbols = [], [], []
+    for code, value in entries:
+        token_type = TOKEN_TYPES[code]
+        symbol = None
+        if token_type is TokenType.IDENTIFIER:
+            symbol = symbols.intern(value)
+            value = symbols.names[symbol]
+        types.append(token_type)
+        values.append(value)
+        token_symbols.append(symbol)
+    tokens = list(map(Token, map(types.__getitem__, indices), map(values.__getitem__, indices),
+                      map(token_symbols.__getitem__, indices), offsets, itertools.repeat(lines, len(indices))))
+    for index, end in zip(spans, span_ends):
+        token = tokens[index]
+        tokens[index] = span = SpanToken(token.type, source, token.offset, end)
+        span.offset = token.offset
+        span.lines = lines
+    return tokens
 
-        return Token(TokenType.IDENTIFIER, value)
+
+def lex_chunk(chunk, base, engine):
+    # Worker for Lexer.tokenize_parallel: the tokens of chunk, which starts at offset base of the whole
+    # input, as a TokenEncoder result. The brackets are given as their effect on the stack of open
+    # delimiters: closed lists the closing ones that found the chunk's stack empty, and opened the
+    # (delimiter, offset) pairs still open at the end. error is the offset of the first ERROR token,
+    # where the tokens stop.
+    encoder = TokenEncoder(base)
+    closed = []
+    opened = []
+    error = None
+    for token in Lexer(engine=engine).iter_tokens(chunk):
+        if token.type is TokenType.ERROR:
+            error = base + token.offset
+            break
+        if token.type is TokenType.DELIMITER:
+            if token.value in '({[':
+                opened.append((token.value, base + token.offset))
+            elif token.value in ')}]':
+                if not opened:
+                    closed.append(token.value)
+                elif opened[-1][0] == BRACKET_PAIRS[token.value]:
+                    opened.pop()
+        encoder.add(token)
+    return encoder.encoded(), closed, opened, error
+
+
+def lex_stats_flag(argv):
+    # The driver scripts take --lex-stats anywhere on the command line: returns the other arguments
+    # and whether it was given
+    return [arg for arg in argv if arg != "--lex-stats"], "--lex-stats" in argv
+
+
+def format_stats(stats):
+    total = sum(stats["tokens"].values())
+    seconds = stats["seconds"]
+    lines = ["Lexer stats ({} engine): {} characters, {} tokens in {:.4f}s".format(stats["engine"], stats["characters"], total, seconds)]
+    if stats["cache_hits"]:
+        lines.append("  {} input(s) taken from the token cache without lexing, not counted here".format(stats["cache_hits"]))
+    if seconds > 0:
+        lines.append("  {:.0f} chars/sec, {:.0f} tokens/sec".format(stats["characters"] / seconds, total / seconds))
+    lines.append("  tokens:")
+    for name, count in sorted(stats["tokens"].items()):
+        lines.append("    {:<12}{}".format(name, count))
+    lines.append("  state transitions:")
+    for name, count in sorted(stats["transitions"].items()):
+        lines.append("    {:<14}{}".format(name, count))
+    return "\n".join(lines)
+
+
+def print_stats(stats):
+    # reports go to stderr, so they never mix with a driver's output
+    print(format_stats(stats), file=sys.stderr)
+
+
+async def print_stdin_tokens(lexer):
+    # Print tokens while stdin is still being written to. Only pipes, sockets and terminals can be
+    # read through the event loop, so a redirected file is read in chunks instead.
+    import asyncio
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except ValueError:
+        for token in lexer.iter_file_tokens(sys.stdin):
+            print(token)
+        return
+    async for token in lexer.aiter_stream_tokens(reader):
+        print(token)
 
 
 def main(input_file):
-    if len(sys.argv) != 2:
-        print("Usage: python3.11 lexer.py <input_file>")
+    args, lex_stats = lex_stats_flag(sys.argv[1:])
+    if len(args) != 1:
+        print("Usage: python3.11 lexer.py [--lex-stats] <input_file | ->")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
 
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            source_code = f.read()
-
-        # print(source_code)
-        lexer = Lexer()
-        tokens = lexer.tokenize(source_code)
-        for token in tokens:
-            print(token)
+        lexer = Lexer(stats=lex_stats)
+        if input_file == "-":
+            import asyncio
+            asyncio.run(print_stdin_tokens(lexer))
+        else:
+            # the file is lexed from an mmap, without decoding it to a str first
+            for token in lexer.tokenize_file(input_file):
+                print(token)
+        if lex_stats:
+            print_stats(lexer.stats)
 
     except FileNotFoundError:
         print("Error: File {} not found.".format(input_file))
@@ -284,4 +1377,4 @@ def main(input_file):
 
 
 if __name__ == "__main__":
-    main(sys.argv[1])
\ No newline at end of file
+    main(sys.argv[-1])
\ No newline at end of file
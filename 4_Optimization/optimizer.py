@@ -8,9 +8,9 @@ from parser import Parser
 from codegen import MIPSCodeGenerator
 
 class OptimizingMIPSCodeGenerator(MIPSCodeGenerator):
-    def __init__(self):
-        super().__init__()
-        self.constant_map = {}  # For constant propagation
+    def __init__(self, symbols=None):
+        super().__init__(symbols)
+        self.constant_map = {}  # For constant propagation, keyed by variable symbol id
 
     def optimize_ast(self, node):
         """Optimize the AST before code generation."""
@@ -32,13 +32,14 @@ class OptimizingMIPSCodeGenerator(MIPSCodeGenerator):
             # Constant Propagation
             optimized_expr = self.optimize_ast(node.expr)
             if isinstance(optimized_expr, ast_node.NumberNode):
-                self.constant_map[node.var.name] = optimized_expr.value
+                self.constant_map[self.variable_symbol(node.var)] = optimized_expr.value
             return ast_node.AssignNode(node.var, optimized_expr)
 
         elif isinstance(node, ast_node.IdentifierNode):
             # Replace variable with constant if available
-            if node.name in self.constant_map:
-                return ast_node.NumberNode(self.constant_map[node.name])
+            symbol = self.variable_symbol(node)
+            if symbol in self.constant_map:
+                return ast_node.NumberNode(self.constant_map[symbol])
 
         elif isinstance(node, ast_node.WhileNode):
             # Dead Code Elimination
@@ -104,15 +105,17 @@ class OptimizingMIPSCodeGenerator(MIPSCodeGenerator):
 
 
 class OptimizedPipeline:
-    def __init__(self, source_code, output_filename):
+    def __init__(self, source_code, output_filename, lex_stats=False):
         self.generator = OptimizingMIPSCodeGenerator()
         self.source_code = source_code
         self.output_filename = output_filename
+        self.lex_stats = lex_stats
 
     def process(self):
         # Step 1: Lexical Analysis
-        parser = Parser(self.source_code)
+        parser = Parser(self.source_code, lex_stats=self.lex_stats)
         ast = parser.parse()
+        self.generator.symbols = parser.symbols     # the ids in the AST are the parser's
 
         # Step 2: Perform Optimizations
         optimized_ast = [self.generator.optimize_ast(node) for node in ast if node]
@@ -129,14 +132,17 @@ class OptimizedPipeline:
         with open(self.output_filename, "w") as output_file:
             output_file.write(generated_code)
         print(f"Generated MIPS code saved to {self.output_filename}")
+        if self.lex_stats:
+            lexer_2.print_stats(parser.lexer.stats)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python mips_codegen.py <input_file>")
+    args, lex_stats = lexer_2.lex_stats_flag(sys.argv[1:])
+    if len(args) != 1:
+        print("Usage: python mips_codegen.py [--lex-stats] <input_file>")
         sys.exit(1)
 
-    input_file = sys.argv[1]
+    input_file = args[0]
     with open(input_file, "r", encoding="utf-8") as f:
         source_code = f.read()
 
@@ -148,5 +154,5 @@ if __name__ == "__main__":
     else:
         output_filename = "samples_output/output.asm"  # Default output name if no sample number is found
 
-    pipeline = OptimizedPipeline(source_code, output_filename)
+    pipeline = OptimizedPipeline(source_code, output_filename, lex_stats)
     pipeline.process()
@@ -5,23 +5,269 @@ import sys
 
 import ast_node
 import lexer_2
+import token_cache
+
+# Binding power of every binary operator, higher binds tighter; all of them associate to the left.
+# "," is the loosest, like the comparisons, so call arguments come out as "," nodes.
+BINDING_POWERS = {operator: 1 for operator in ["&&", "||", '!=', '==', '<=', '>=', '>', '<', "그리고", "이거나", ","]}
+BINDING_POWERS.update({operator: 2 for operator in ["+", "-"]})
+BINDING_POWERS.update({operator: 3 for operator in ["*", "**", "/", "%"]})
+
+# Methods that can nest, and so recurse; with Parser(iterative=True) each runs its *_steps generator instead
+ITERATIVE_METHODS = ("parse_expr", "parse_base_expr", "parse_method_call", "parse_element_call", "parse_func_call",
+                     "parse_if", "parse_while", "parse_func_def", "parse_body", "parse_statement", "parse_assign",
+                     "parse_print", "parse_return")
+
+# Keyword that starts a statement -> method that parses it, at the top level and inside blocks.
+# Any other keyword is an error.
+TOP_LEVEL_PARSERS = {"함수": "parse_func_def", "출력": "parse_print", "만약에": "parse_if", "동안에": "parse_while",
+                     "배열": "parse_array_declaration", "딕셔너리": "parse_dict_declaration"}
+STATEMENT_PARSERS = {"만약에": "parse_if", "동안에": "parse_while", "반환": "parse_return", "출력": "parse_print"}
+
+# Tokens kept by Parser(stream=True): enough to look back over a rewind and ahead for peek_next_token(2)
+STREAM_WINDOW = 16
+
+# Deepest nesting of blocks and expressions BodyCheck follows; Parser(lazy=True) parses deeper bodies eagerly
+DEFER_MAX_DEPTH = 100
+
+class TokenWindow:
+    # The tokens of a lazy token iterator, read as they are asked for. Only the last `size` of them
+    # are kept, in a ring buffer, so memory stays bounded however long the input is.
+    def __init__(self, tokens, size=STREAM_WINDOW):
+        self.source = tokens
+        self.buffer = [None] * size
+        self.size = size
+        self.count = 0      # tokens read from the iterator so far
+        self.exhausted = False
+
+    def get(self, index):
+        # the token at index, or None past the end of the input
+        if index >= self.count:
+            return None if self.exhausted else self.read_until(index)
+        if index < self.count - self.size:
+            raise IndexError("token {} is no longer in the window of {} tokens".format(index, self.size))
+        return self.buffer[index % self.size]
+
+    def read_until(self, index):
+        buffer = self.buffer
+        size = self.size
+        for token in self.source:
+            buffer[self.count % size] = token
+            self.count += 1
+            if self.count > index:
+                return token
+        self.exhausted = True
+        return None
+
+class DeferredBody:
+    # The body of a function that Parser(lazy=True) skipped: its tokens run from start up to the
+    # closing '}' at end. FuncDefNode parses it the first time its body is read.
+    def __init__(self, parser, start, end):
+        self.parser = parser
+        self.start = start
+        self.end = end
+
+    def parse(self):
+        return self.parser.parse_body_range(self.start, self.end)
+
+class BodyCheck:
+    # Whether Parser(lazy=True) may defer a function body, decided without building nodes. Only a
+    # body that parse_body certainly parses up to its closing brace can wait: one that fails takes
+    # parse_func_def's recovery path, which makes the function an ErrorNode and can read past the
+    # brace into the top level, so it has to be parsed where the eager parser parses it. BodyCheck
+    # accepts a subset of the statement grammar that parses without errors, and nothing nested
+    # deeper than DEFER_MAX_DEPTH; every other body is parsed eagerly. Each method returns the
+    # position after what it accepted, or None.
+    def __init__(self, tokens, end):
+        self.tokens = tokens
+        self.end = end      # position of the body's closing brace
+
+    def body(self, start):
+        return self.block(start, 0) == self.end
+
+    def block(self, position, depth):
+        # statements up to a '}', whose position is returned
+        if depth > DEFER_MAX_DEPTH:
+            return None
+        tokens = self.tokens
+        while position is not None and tokens[position].value != "}":
+            position = self.statement(position, depth)
+        return position
+
+    def statement(self, position, depth):
+        tokens = self.tokens
+        token = tokens[position]
+        if token.type == lexer_2.TokenType.IDENTIFIER:
+            following = tokens[position + 1].value
+            if following == "=":
+                return self.expr(position + 2, depth)
+            if following == ".":
+                return self.method_call(position + 1, depth)
+            if following == "[":
+                position = self.expr(position + 2, depth)
+                if position is None or tokens[position].value != "]" or tokens[position + 1].value != "=":
+                    return None
+                return self.expr(position + 2, depth)
+        elif token.type == lexer_2.TokenType.KEYWORD:
+            if token.value == "반환":
+                return self.expr(position + 1, depth)
+            if token.value == "출력":
+                if tokens[position + 1].value != "(":
+                    return None
+                return self.closed(self.expr(position + 2, depth), ")")
+            if token.value == "만약에" or token.value == "동안에":
+                position = self.expr(position + 1, depth)
+                if position is None or tokens[position].value != "{":
+                    return None
+                position = self.closed_block(position + 1, depth)
+                if token.value == "만약에" and position is not None and tokens[position].value == "아니면":
+                    if tokens[position + 1].value != "{":
+                        return None
+                    position = self.closed_block(position + 2, depth)
+                return position
+        return None
+
+    def closed_block(self, position, depth):
+        # a nested block after its '{', which must close before the body does
+        position = self.block(position, depth + 1)
+        if position is None or position >= self.end:
+            return None
+        return position + 1
+
+    def closed(self, position, closer):
+        # position past closer, when it is the token at position
+        if position is None or self.tokens[position].value != closer:
+            return None
+        return position + 1
+
+    def expr(self, position, depth):
+        # operands joined by BINDING_POWERS operators, all of which parse_expr folds in
+        if depth > DEFER_MAX_DEPTH:
+            return None
+        tokens = self.tokens
+        while True:
+            position = self.operand(position, depth)
+            if position is None or tokens[position].value not in BINDING_POWERS:
+                return position
+            position += 1
+
+    def operand(self, position, depth):
+        tokens = self.tokens
+        token = tokens[position]
+        if token.type == lexer_2.TokenType.NUMBER:
+            # a '.' after a number starts one of parse_base_expr's error patterns
+            return None if tokens[position + 1].value == "." else position + 1
+        if token.type == lexer_2.TokenType.STRING:
+            return position + 1
+        if token.type == lexer_2.TokenType.IDENTIFIER:
+            following = tokens[position + 1].value
+            if following == ".":
+                return self.method_call(position + 1, depth)
+            if following == "(":
+                return self.arguments(position + 2, depth)
+            return position + 1
+        if token.type == lexer_2.TokenType.KEYWORD:
+            if token.value in ("진실", "거짓", "널"):
+                return position + 1
+            if token.value == "랜덤" and tokens[position + 1].value == "(" and tokens[position + 2].value == ")":
+                return position + 3
+            return None
+        if token.value == "(":
+            return self.closed(self.expr(position + 1, depth + 1), ")")
+        return None
+
+    def method_call(self, position, depth):
+        # .method(arguments) from the '.'
+        tokens = self.tokens
+        if tokens[position + 1].type != lexer_2.TokenType.KEYWORD or tokens[position + 2].value != "(":
+            return None
+        return self.arguments(position + 3, depth)
+
+    def arguments(self, position, depth):
+        # call arguments after the '(', up to and past the ')'; "," is an operator to parse_expr
+        token = self.tokens[position]
+        if token.type == lexer_2.TokenType.DELIMITER:
+            return position + 1 if token.value == ")" else None
+        return self.closed(self.expr(position, depth + 1), ")")
 
 class Parser:
-    def __init__(self, source_code):
-        self.lexer = lexer_2.Lexer()
-        self.tokens = self.lexer.tokenize(source_code)  # Tokenize directly here
+    def __init__(self, source_code, engine="state", lex_stats=False, iterative=False, stream=False, lazy=False):
+        self.symbols = lexer_2.SymbolTable()    # identifier ids of this compilation, for code generation
+        self.lexer = lexer_2.Lexer(engine=engine, stats=lex_stats, symbols=self.symbols)
+        cache = token_cache.active_cache()
+        if stream:
+            # lex only as far as the parser has read; without the whole token list there is no
+            # self.brackets for skip_brackets
+            self.tokens = TokenWindow(self.lexer.iter_code_tokens(source_code))
+            self.current_token = self.window_token
+            self.peek_next_token = self.window_peek_token
+        elif cache is not None:
+            self.tokens = cache.tokenize_code(self.lexer, source_code)
+        else:
+            self.tokens = self.lexer.tokenize_code(source_code)  # Tokenize directly here, comments go to self.comments
+        self.comments = self.lexer.comments
+        self.brackets = self.lexer.brackets     # index of an opening bracket -> index of its partner
         self.position = 0
+        # BodyCheck knows Parser's grammar only, so a subclass that changes it parses eagerly
+        self.lazy = lazy and not any(overrides_method(type(self), name) for name in ITERATIVE_METHODS)
+        self.deferred = []      # FuncDefNodes whose bodies lazy=True skipped, in order
+        self.iterative = iterative
+        if iterative:
+            for name in ITERATIVE_METHODS:
+                if overrides_steps(type(self), name):
+                    setattr(self, name + "_steps", self.recursive_steps(getattr(self, name)))
+                setattr(self, name, self.iterative_method(getattr(self, name + "_steps")))
+            self.statement_steps = {keyword: getattr(self, name + "_steps") for keyword, name in STATEMENT_PARSERS.items()}
+        self.top_level_parsers = {keyword: getattr(self, name) for keyword, name in TOP_LEVEL_PARSERS.items()}
+        self.statement_parsers = {keyword: getattr(self, name) for keyword, name in STATEMENT_PARSERS.items()}
 
     def current_token(self):
-        while self.position < len(self.tokens) and self.tokens[self.position].type == lexer_2.TokenType.COMMENT:
-            self.position += 1
         return self.tokens[self.position] if self.position < len(self.tokens) else None
 
+    def window_token(self):
+        return self.tokens.get(self.position)
+
+    def window_peek_token(self, offset=1):
+        return self.tokens.get(self.position + offset)
+
     def advance(self):
         self.position += 1
-        while self.position < len(self.tokens) and self.tokens[self.position].type == lexer_2.TokenType.COMMENT:
-            self.position += 1
+
+    def skip_brackets(self):
+        # jump past the bracketed group opened by the current token, in one step
+        self.position = self.brackets[self.position] + 1
     
+    def defer_body(self):
+        # With lazy=True, skip the body opened by the current token and return a DeferredBody for it.
+        # Returns None, and the body is parsed now, when the brace has no partner or BodyCheck
+        # cannot tell that the body parses.
+        token = self.current_token()
+        if not self.lazy or token is None or token.value != "{" or self.position not in self.brackets:
+            return None
+        end = self.brackets[self.position]
+        if not BodyCheck(self.tokens, end).body(self.position + 1):
+            return None
+        body = DeferredBody(self, self.position + 1, end)
+        self.skip_brackets()
+        return body
+
+    def parse_body_range(self, start, end):
+        # parse the statements of a deferred function body, leaving the parser's position as it was
+        position = self.position
+        self.position = start
+        try:
+            body = self.parse_body()
+            if self.position != end:
+                raise SyntaxError("Function body does not end at its closing brace")
+        finally:
+            self.position = position
+        return body
+
+    def parse_deferred_bodies(self):
+        # parse every body that lazy=True deferred, in order, so that none waits for its first use
+        for node in self.deferred:
+            node.body
+
     def expect(self, expected_type, expected_value=None):
         token = self.current_token()
         if token and token.type == expected_type and (expected_value is None or token.value == expected_value):
@@ -37,20 +283,10 @@ class Parser:
         while self.current_token():
             token = self.current_token()
             if token.type == lexer_2.TokenType.KEYWORD:
-                if token.value == "함수":
-                    ast.append(self.parse_func_def())
-                elif token.value == "출력":
-                    ast.append(self.parse_print())
-                elif token.value == "만약에": 
-                    ast.append(self.parse_if())
-                elif token.value == "동안에":
-                    ast.append(self.parse_while())
-                elif token.value == "배열":
-                    ast.append(self.parse_array_declaration())
-                elif token.value == "딕셔너리":
-                    ast.append(self.parse_dict_declaration())
-                else:
+                parse_keyword = self.top_level_parsers.get(token.value)
+                if parse_keyword is None:
                     raise SyntaxError("Unexpected top-level token {}".format(token.value))
+                ast.append(parse_keyword())
             elif token.type == lexer_2.TokenType.IDENTIFIER:
                 identifier = token
                 self.advance()
@@ -59,9 +295,6 @@ class Parser:
                 else:
                     self.position -= 1
                     ast.append(self.parse_assign())
-            elif token.type == lexer_2.TokenType.KEYWORD and token.value == "clear":
-                self.advance()  # Move to the next token after 'clear'
-                continue  # Skip the 'clear' token and continue parsing
             else:
                 raise SyntaxError("Unexpected top-level token {}".format(token.value))
         return ast
@@ -69,20 +302,20 @@ class Parser:
     # Array Declaration Parsing
     def parse_array_declaration(self):
         self.expect(lexer_2.TokenType.KEYWORD, "배열")
-        array_name = self.expect(lexer_2.TokenType.IDENTIFIER).value
+        array_name = self.expect(lexer_2.TokenType.IDENTIFIER)
         self.expect(lexer_2.TokenType.OPERATOR, "=")
         self.expect(lexer_2.TokenType.DELIMITER, "[")
         self.expect(lexer_2.TokenType.DELIMITER, "]")
-        return ast_node.ListNode(array_name)
+        return ast_node.ListNode(array_name.value, symbol=array_name.symbol)
     
     # Dictionary Declaration Parsing
     def parse_dict_declaration(self):
         self.expect(lexer_2.TokenType.KEYWORD, "딕셔너리")
-        array_name = self.expect(lexer_2.TokenType.IDENTIFIER).value
+        array_name = self.expect(lexer_2.TokenType.IDENTIFIER)
         self.expect(lexer_2.TokenType.OPERATOR, "=")
         self.expect(lexer_2.TokenType.DELIMITER, "{")
         self.expect(lexer_2.TokenType.DELIMITER, "}")
-        return ast_node.DictNode(array_name)
+        return ast_node.DictNode(array_name.value, symbol=array_name.symbol)
     
     def parse_method_call(self, list):
         self.expect(lexer_2.TokenType.DELIMITER, ".")
@@ -97,13 +330,13 @@ class Parser:
         self.expect(lexer_2.TokenType.DELIMITER, ")")
         return ast_node.MethodCallNode(method, args)
 
-    def parse_element_call(self, obj_name):
+    def parse_element_call(self, obj_name, symbol=None):
         self.expect(lexer_2.TokenType.DELIMITER, "[")
         index = self.parse_expr()
         self.expect(lexer_2.TokenType.DELIMITER, "]")
         self.expect(lexer_2.TokenType.OPERATOR, "=")
         value = self.parse_expr()
-        return ast_node.DictAssignNode(ast_node.DictNode(obj_name), index, value)
+        return ast_node.DictAssignNode(ast_node.DictNode(obj_name, symbol=symbol), index, value)
     
     def parse_func_call(self, func_name):
         self.expect(lexer_2.TokenType.DELIMITER, "(")
@@ -117,30 +350,20 @@ class Parser:
 
 
     # Parse Expressions
-    def parse_expr(self):
-        left = self.parse_pred()
-        while self.current_token() and self.current_token().value in ["&&", "||", '!=', '==', '<=', '>=', '>', '<', "그리고", "이거나", ","]:
-            operator = self.current_token().value
-            self.advance()
-            right = self.parse_pred()
-            left = ast_node.BinaryOpNode(left, operator, right)
-        return left
-
-    def parse_pred(self):
-        left = self.parse_term()
-        while self.current_token() and self.current_token().value in ["+", "-"]:
-            operator = self.current_token().value
-            self.advance()
-            right = self.parse_term()
-            left = ast_node.BinaryOpNode(left, operator, right)
-        return left
-
-    def parse_term(self):
+    def parse_expr(self, min_power=0):
+        # Precedence climbing over BINDING_POWERS: parse an operand, then keep folding in operators that
+        # bind tighter than min_power. Builds the same left-associative trees as one function per level.
         left = self.parse_base_expr()
-        while self.current_token() and self.current_token().value in ["*", "**", "/", "%"]:
-            operator = self.current_token().value
-            self.advance()
-            right = self.parse_base_expr()
+        while True:
+            token = self.current_token()
+            if token is None:
+                break
+            operator = token.value
+            power = BINDING_POWERS.get(operator)
+            if power is None or power <= min_power:
+                break
+            self.position += 1
+            right = self.parse_expr(power)
             left = ast_node.BinaryOpNode(left, operator, right)
         return left
 
@@ -183,7 +406,7 @@ class Parser:
                 return self.parse_method_call(identifier)  # Array method calls
             if self.current_token() and self.current_token().value == "(":
                 return self.parse_func_call(identifier)
-            return ast_node.IdentifierNode(identifier)
+            return ast_node.IdentifierNode(identifier, token.symbol)
         elif token.type == lexer_2.TokenType.KEYWORD:
             if token.value == "랜덤":
                 self.advance()  # Move past "랜덤"
@@ -242,7 +465,8 @@ class Parser:
         return ast_node.WhileNode(condition, body)
     
     # Parse Function Definition
-    def parse_func_def(self):
+    def parse_func_head(self):
+        # 함수 name(params): returns the name and the parameter names
         self.expect(lexer_2.TokenType.KEYWORD, "함수")
         func_name = self.expect(lexer_2.TokenType.IDENTIFIER).value
         self.expect(lexer_2.TokenType.DELIMITER, "(")
@@ -253,6 +477,18 @@ class Parser:
                 self.advance()
                 params.append(self.expect(lexer_2.TokenType.IDENTIFIER).value)
         self.expect(lexer_2.TokenType.DELIMITER, ")")
+        return func_name, params
+
+    def deferred_function(self, func_name, params, body):
+        node = ast_node.FuncDefNode(func_name, params, body)
+        self.deferred.append(node)
+        return node
+
+    def parse_func_def(self):
+        func_name, params = self.parse_func_head()
+        body = self.defer_body()
+        if body is not None:
+            return self.deferred_function(func_name, params, body)
 
         # Handle incorrect delimiter for function body
         try:
@@ -294,31 +530,29 @@ class Parser:
     def parse_statement(self):
         token = self.current_token()
         if token.type == lexer_2.TokenType.KEYWORD:
-            if token.value == "만약에":
-                return self.parse_if()
-            elif token.value == "동안에":
-                return self.parse_while()
-            elif token.value == "반환":
-                self.advance()
-                return ast_node.ReturnNode(self.parse_expr())
-            elif token.value == "출력":
-                return self.parse_print()
+            parse_keyword = self.statement_parsers.get(token.value)
+            if parse_keyword is not None:
+                return parse_keyword()
         elif token.type == lexer_2.TokenType.IDENTIFIER:
             self.advance()
             if self.current_token().value == ".":
                 return self.parse_method_call(token.value)  # Array method calls
             elif self.current_token().value == "[":
-                return self.parse_element_call(token.value)  # element method calls
+                return self.parse_element_call(token.value, token.symbol)  # element method calls
             elif self.current_token().value == "=":
                 self.position -= 1
                 return self.parse_assign() 
         raise SyntaxError("Unexpected token {}".format(token.value))
 
+    def parse_return(self):
+        self.advance()  # past 반환, which chose this method
+        return ast_node.ReturnNode(self.parse_expr())
+
     def parse_assign(self):
-        var = self.expect(lexer_2.TokenType.IDENTIFIER).value
+        var = self.expect(lexer_2.TokenType.IDENTIFIER)
         self.expect(lexer_2.TokenType.OPERATOR, "=")
         expr = self.parse_expr()
-        return ast_node.AssignNode(ast_node.IdentifierNode(var), expr)
+        return ast_node.AssignNode(ast_node.IdentifierNode(var.value, var.symbol), expr)
 
     def parse_print(self):
         self.expect(lexer_2.TokenType.KEYWORD, "출력")
@@ -332,14 +566,233 @@ class Parser:
             return self.tokens[self.position + offset]
         return None
 
-    
+    # Explicit-stack parsing. Each *_steps generator mirrors the parse_* method of the same name, but
+    # instead of calling a method that can nest it yields that method's generator and is sent back its
+    # result. run_steps keeps the suspended generators in a list, so deeply nested blocks, parentheses
+    # and calls use heap memory instead of Python stack frames. A change to a parse_* method in
+    # ITERATIVE_METHODS must be made to its *_steps twin too; benchmark.py nesting fails when the two
+    # parsers disagree.
+    def iterative_method(self, steps):
+        def method(*args):
+            return self.run_steps(steps(*args))
+        return method
+
+    def recursive_steps(self, method):
+        # *_steps for a parse_* method that a subclass overrides without its generator: runs the
+        # override as it is, recursion included
+        def steps(*args):
+            return method(*args)
+            yield
+        return steps
+
+    def run_steps(self, steps):
+        stack = [steps]
+        result = None
+        error = None
+        while stack:
+            try:
+                if error is None:
+                    nested = stack[-1].send(result)
+                else:
+                    pending, error = error, None
+                    nested = stack[-1].throw(pending)
+            except StopIteration as stop:
+                stack.pop()
+                result = stop.value
+            except BaseException as exception:
+                # hand the error to the generator that is waiting for this one, as a raise would
+                stack.pop()
+                if not stack:
+                    raise
+                error = exception
+            else:
+                stack.append(nested)
+                result = None
+        return result
+
+    def parse_expr_steps(self, min_power=0):
+        left = yield self.parse_base_expr_steps()
+        while True:
+            token = self.current_token()
+            if token is None:
+                break
+            operator = token.value
+            power = BINDING_POWERS.get(operator)
+            if power is None or power <= min_power:
+                break
+            self.position += 1
+            right = yield self.parse_expr_steps(power)
+            left = ast_node.BinaryOpNode(left, operator, right)
+        return left
+
+    def parse_base_expr_steps(self):
+        token = self.current_token()
+        if token.type == lexer_2.TokenType.IDENTIFIER:
+            self.advance()
+            identifier = token.value
+            if self.current_token() and self.current_token().value == ".":
+                return (yield self.parse_method_call_steps(identifier))
+            if self.current_token() and self.current_token().value == "(":
+                return (yield self.parse_func_call_steps(identifier))
+            return ast_node.IdentifierNode(identifier, token.symbol)
+        elif token.value == "(":
+            self.advance()
+            expr = yield self.parse_expr_steps()
+            self.expect(lexer_2.TokenType.DELIMITER, ")")
+            return expr
+        # everything else is a single token, or 랜덤()
+        return Parser.parse_base_expr(self)
+
+    def parse_method_call_steps(self, list):
+        self.expect(lexer_2.TokenType.DELIMITER, ".")
+        method = self.expect(lexer_2.TokenType.KEYWORD).value
+        self.expect(lexer_2.TokenType.DELIMITER, "(")
+        args = []
+        if self.current_token().type != lexer_2.TokenType.DELIMITER or self.current_token().value != ")":
+            args.append((yield self.parse_expr_steps()))
+            while self.current_token().value == ",":
+                self.advance()
+                args.append((yield self.parse_expr_steps()))
+        self.expect(lexer_2.TokenType.DELIMITER, ")")
+        return ast_node.MethodCallNode(method, args)
+
+    def parse_element_call_steps(self, obj_name, symbol=None):
+        self.expect(lexer_2.TokenType.DELIMITER, "[")
+        index = yield self.parse_expr_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, "]")
+        self.expect(lexer_2.TokenType.OPERATOR, "=")
+        value = yield self.parse_expr_steps()
+        return ast_node.DictAssignNode(ast_node.DictNode(obj_name, symbol=symbol), index, value)
+
+    def parse_func_call_steps(self, func_name):
+        self.expect(lexer_2.TokenType.DELIMITER, "(")
+        args = []
+        while self.current_token() and self.current_token().type != lexer_2.TokenType.DELIMITER:
+            args.append((yield self.parse_expr_steps()))
+            if self.current_token() and self.current_token().value == ",":
+                self.advance()
+        self.expect(lexer_2.TokenType.DELIMITER, ")")
+        return ast_node.FuncCallNode(func_name, args)
+
+    def parse_if_steps(self):
+        self.expect(lexer_2.TokenType.KEYWORD, "만약에")
+        condition = yield self.parse_expr_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, "{")
+        body = yield self.parse_body_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, "}")
+        else_body = None
+        if self.current_token() and self.current_token().value == "아니면":
+            self.advance()
+            self.expect(lexer_2.TokenType.DELIMITER, "{")
+            else_body = yield self.parse_body_steps()
+            self.expect(lexer_2.TokenType.DELIMITER, "}")
+        return ast_node.IfNode(condition, body, else_body)
+
+    def parse_while_steps(self):
+        self.expect(lexer_2.TokenType.KEYWORD, "동안에")
+        condition = yield self.parse_expr_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, "{")
+        body = yield self.parse_body_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, "}")
+        return ast_node.WhileNode(condition, body)
+
+    def parse_func_def_steps(self):
+        func_name, params = self.parse_func_head()
+        body = self.defer_body()
+        if body is not None:
+            return self.deferred_function(func_name, params, body)
+
+        try:
+            self.expect(lexer_2.TokenType.DELIMITER, "{")
+            body = yield self.parse_body_steps()
+            try:
+                self.expect(lexer_2.TokenType.DELIMITER, "}")
+            except SyntaxError as e:
+                message = "Expected function closed with '}', got EOF"
+                context = ast_node.FuncDefNode(func_name, params, body)
+                return ast_node.ErrorNode(message, context)
+            return ast_node.FuncDefNode(func_name, params, body)
+        except GeneratorExit:
+            # closing the suspended generator is not a parse error
+            raise
+        except:
+            closer = "}"
+            if self.current_token().value == "[":
+                closer = "]"
+            elif self.current_token().value == "(":
+                closer = ")"
+            message = "Unexpected function open"
+            self.advance()
+            body = []
+            while self.current_token() and self.current_token().value != closer:
+                body.append((yield self.parse_statement_steps()))
+            context = ast_node.FuncDefNode(func_name, params, body)
+            self.advance()
+            return ast_node.ErrorNode(message, context)
+
+    def parse_body_steps(self):
+        statements = []
+        while self.current_token() and self.current_token().value != "}":
+            statements.append((yield self.parse_statement_steps()))
+        return statements
+
+    def parse_statement_steps(self):
+        token = self.current_token()
+        if token.type == lexer_2.TokenType.KEYWORD:
+            parse_keyword = self.statement_steps.get(token.value)
+            if parse_keyword is not None:
+                return (yield parse_keyword())
+        elif token.type == lexer_2.TokenType.IDENTIFIER:
+            self.advance()
+            if self.current_token().value == ".":
+                return (yield self.parse_method_call_steps(token.value))
+            elif self.current_token().value == "[":
+                return (yield self.parse_element_call_steps(token.value, token.symbol))
+            elif self.current_token().value == "=":
+                self.position -= 1
+                return (yield self.parse_assign_steps())
+        raise SyntaxError("Unexpected token {}".format(token.value))
+
+    def parse_return_steps(self):
+        self.advance()  # past 반환, which chose this method
+        return ast_node.ReturnNode((yield self.parse_expr_steps()))
+
+    def parse_assign_steps(self):
+        var = self.expect(lexer_2.TokenType.IDENTIFIER)
+        self.expect(lexer_2.TokenType.OPERATOR, "=")
+        expr = yield self.parse_expr_steps()
+        return ast_node.AssignNode(ast_node.IdentifierNode(var.value, var.symbol), expr)
+
+    def parse_print_steps(self):
+        self.expect(lexer_2.TokenType.KEYWORD, "출력")
+        self.expect(lexer_2.TokenType.DELIMITER, "(")
+        expr = yield self.parse_expr_steps()
+        self.expect(lexer_2.TokenType.DELIMITER, ")")
+        return ast_node.PrintNode(expr)
+
+
+def overrides_method(cls, name):
+    # whether cls, a Parser subclass, overrides the parse_* method name
+    return getattr(cls, name) is not getattr(Parser, name)
+
+
+def overrides_steps(cls, name):
+    # whether cls, a Parser subclass, overrides the parse_* method name without its *_steps generator
+    for klass in cls.__mro__:
+        if name + "_steps" in vars(klass):
+            return False
+        if name in vars(klass):
+            return True
+    return False
+
+
 # Main function to use the Parser class
-def main(input_file):
+def main(input_file, lex_stats=False):
     try:
         with open(input_file, 'r', encoding='utf-8') as f:
             source_code = f.read()
 
-        parser = Parser(source_code)
+        parser = Parser(source_code, lex_stats=lex_stats)
         ast = parser.parse()
         # visualizer = ast_node.ASTVisualizer()
 
@@ -351,6 +804,9 @@ def main(input_file):
         #     visualizer.add_node(node)
         # visualizer.plot()
 
+        if lex_stats:
+            lexer_2.print_stats(parser.lexer.stats)
+
     except FileNotFoundError:
         print("Error: File '{}' not found.".format(input_file))
         sys.exit(1)
@@ -361,8 +817,9 @@ def main(input_file):
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) != 2:
-        print("Usage: python parser.py <input_file>")
+    args, lex_stats = lexer_2.lex_stats_flag(sys.argv[1:])
+    if len(args) != 1:
+        print("Usage: python parser.py [--lex-stats] <input_file>")
         sys.exit(1)
 
-    main(sys.argv[1])
\ No newline at end of file
+    main(args[0], lex_stats)
\ No newline at end of file
@@ -1,8 +1,15 @@
 #!/bin/bash
 
+# --lex-stats is passed on to the optimizer, which prints the lexer report to stderr
+LEX_STATS=""
+if [ "$1" == "--lex-stats" ]; then
+  LEX_STATS="--lex-stats"
+  shift
+fi
+
 # Usage message
 if [ "$#" -ne 1 ]; then
-  echo "Usage: ./run_parser.sh <input_file>"
+  echo "Usage: ./run_optcodegen.sh [--lex-stats] <input_file>"
   exit 1
 fi
 
@@ -19,7 +26,7 @@ fi
 echo "Running code generator on $INPUT_FILE..."
 
 # Run the code generator
-TOKENS=$(python3 optimizer.py "$INPUT_FILE")
+TOKENS=$(python3 optimizer.py $LEX_STATS "$INPUT_FILE")
 
 # Check if codeg generator ran successfully
 if [ $? -ne 0 ]; then
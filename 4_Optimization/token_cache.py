@@ -0,0 +1,154 @@
+import os
+import array
+import marshal
+import hashlib
+import tempfile
+
+import lexer_2
+
+# Parser looks tokens up in this cache when enable() has been called or this environment variable
+# names a cache directory
+CACHE_ENV = "HANA_TOKEN_CACHE"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Part of every key: the cached type codes only mean the same TokenTypes while their order is unchanged
+KEY_PREFIX = "{}:{}:{}:".format(lexer_2.LEXER_VERSION, marshal.version,
+                                ",".join(token_type.name for token_type in lexer_2.TOKEN_TYPES))
+
+active = None
+
+
+class TokenCache:
+    # Content-addressed store of tokenize_code results: one file per source text, named by the hash
+    # of the text and KEY_PREFIX. Reading a file touches it, and storing one evicts the least
+    # recently used files once the directory holds more than max_bytes.
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, source_code):
+        digest = hashlib.sha256()
+        digest.update(KEY_PREFIX.encode('ascii'))
+        digest.update(source_code.encode('utf-8', 'surrogatepass'))
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + ".tokens")
+
+    def tokenize_code(self, lexer, source_code):
+        # lexer.tokenize_code(source_code), from the cache when the same source was seen before
+        path = self.path(self.key(source_code))
+        tokens = self.load(path, lexer, source_code)
+        if tokens is not None:
+            self.hits += 1
+            if lexer.stats is not None:
+                lexer.stats["cache_hits"] += 1
+            return tokens
+        self.misses += 1
+        tokens = lexer.tokenize_code(source_code)
+        self.store(path, tokens, lexer.comments, lexer.brackets)
+        return tokens
+
+    def load(self, path, lexer, source_code):
+        # The tokens stored at path, rebuilt as the lexer would have left them, or None. Anything that
+        # cannot be read or decoded back into tokens over source_code counts as a miss.
+        try:
+            with open(path, 'rb') as f:
+                entries, indices, offsets, spans, span_ends, comments, brackets = marshal.load(f)
+            os.utime(path)
+            encoded = (entries, array.array('I', indices), array.array('q', offsets),
+                       array.array('I', spans), array.array('q', span_ends))
+            comments = array.array('q', comments)
+            brackets = array.array('q', brackets)
+            if len(comments) % 2 or len(brackets) % 2:
+                raise ValueError("unpaired comment or bracket offsets")
+            for values in (encoded[2], encoded[4], comments):
+                if values and (min(values) < 0 or max(values) > len(source_code)):
+                    raise ValueError("offsets outside the source")
+            lines = lexer_2.LineIndex(source_code)
+            # identifiers are interned again, since symbol ids only hold within one symbol table
+            tokens = lexer_2.decode_tokens(encoded, source_code, lines, lexer.symbols)
+            if max(brackets, default=-1) >= len(tokens):
+                raise ValueError("bracket index past the last token")
+        except Exception:
+            return None
+
+        lexer.comments = []
+        for start, end in zip(comments[::2], comments[1::2]):
+            token = lexer_2.SpanToken(lexer_2.TokenType.COMMENT, source_code, start, end)
+            token.offset = start
+            token.lines = lines
+            lexer.comments.append(token)
+        lexer.brackets = dict(zip(brackets[::2], brackets[1::2]))
+        lexer.input = source_code
+        lexer.lines = lines
+        lexer.position = len(source_code)
+        if any(lexer_2.TOKEN_TYPES[code] is lexer_2.TokenType.ERROR for code, _ in entries):
+            lexer.transition_state(lexer_2.LexerState.ERROR)
+        return tokens
+
+    def store(self, path, tokens, comments, brackets):
+        encoder = lexer_2.TokenEncoder()
+        for token in tokens:
+            encoder.add(token)
+        entries, indices, offsets, spans, span_ends = encoder.encoded()
+        comments = array.array('q', [offset for token in comments for offset in (token.start, token.end)])
+        brackets = array.array('q', [index for pair in brackets.items() for index in pair])
+        data = marshal.dumps((entries, indices.tobytes(), offsets.tobytes(), spans.tobytes(), span_ends.tobytes(),
+                              comments.tobytes(), brackets.tobytes()))
+
+        # write to a temporary file first, so a reader never sees half an entry
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tokens"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".tokens"):
+                os.remove(entry.path)
+
+
+def enable(directory, max_bytes=DEFAULT_MAX_BYTES):
+    global active
+    active = TokenCache(directory, max_bytes)
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+def active_cache():
+    # the cache Parser should use, or None
+    if active is None and os.environ.get(CACHE_ENV):
+        enable(os.environ[CACHE_ENV])
+    return active